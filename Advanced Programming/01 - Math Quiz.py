@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 import random
+import tk_profiler #opt-in callback timing, set TK_PROFILE=1 to turn it on
 
 #The global state (the variables that are accessible to be used anywhere within the code)
 score = 0
@@ -181,6 +182,7 @@ root = tk.Tk()
 root.title("Math Quiz")
 root.geometry("600x400")
 root.configure(bg="#001f3f")
+tk_profiler.install(root, "Math Quiz") #does nothing unless TK_PROFILE is set
 
 style = ttk.Style()
 style.theme_use("clam")
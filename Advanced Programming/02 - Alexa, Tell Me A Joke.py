@@ -1,48 +1,1053 @@
 import tkinter as tk
+import asyncio
+import bisect
+import json
+import mmap
+import os
 import random
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, urlsplit
+import tk_profiler #opt-in callback timing, set TK_PROFILE=1 to turn it on
 
 #Loading the joke file
+#The jokes aren't read into a list any more. A one-off index of where each joke starts in
+#jokes.txt is saved next to it (jokes.txt.idx) and both files are memory mapped, so starting
+#up takes the same time however many jokes there are, and only the jokes actually told get read.
+#When jokes are added to the end of jokes.txt only the new lines are read to bring the index up to date.
+TAIL_CHECK = 4096  #how much of the end of the old jokes file has to be unchanged for new lines to count as appended
+
+def tail_crc(data, size):
+    return zlib.crc32(data[max(0, size - TAIL_CHECK):size])
+
+def appended_to(data, size, crc):
+    #True if data looks like an old size byte version of the file (ending in crc) with whole lines added after it
+    return size <= len(data) and (size == 0 or data[size - 1:size] == b"\n") and tail_crc(data, size) == crc
+
+class JokeCorpus:
+    MAGIC = b"JKX2"
+    HEADER = struct.Struct("<4sIQQ")  #magic, tail crc, size and modification time of the jokes file it was made from
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.index_filename = filename + ".idx"
+        self._file = self._map = self._index_file = self._index_map = None
+        self.offsets = array("Q")  #where each joke line starts (a memoryview of the index file once it's mapped)
+        self.size = 0  #how much of the jokes file the offsets cover
+        try:
+            self._file = open(filename, "rb")
+        except FileNotFoundError:
+            print("Jokes file not found.")
+            return
+        st = os.fstat(self._file.fileno())
+        if st.st_size == 0:
+            return  #mmap can't map an empty file, and there's nothing to tell anyway
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._map)
+        if not self._open_index(st):
+            self._build_index(st)
+
+    def _open_index(self, st):
+        #use the saved index if it was made from this version of the jokes file
+        try:
+            self._index_file = open(self.index_filename, "rb")
+        except FileNotFoundError:
+            return False
+        header = self._index_file.read(self.HEADER.size)
+        size = os.fstat(self._index_file.fileno()).st_size
+        if len(header) != self.HEADER.size or (size - self.HEADER.size) % self.offsets.itemsize:
+            return self._drop_index()  #damaged, make it again
+        magic, crc, old_size, old_mtime = self.HEADER.unpack(header)
+        if magic != self.MAGIC:
+            return self._drop_index()
+        if (old_size, old_mtime) == (st.st_size, st.st_mtime_ns):
+            if size > self.HEADER.size:
+                self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.offsets = memoryview(self._index_map)[self.HEADER.size:].cast("Q")
+            return True
+        if not appended_to(self._map, old_size, crc):
+            return self._drop_index()  #changed, not just added to, make it again
+
+        #jokes were added to the end: keep the saved offsets and only look through the new lines
+        offsets = array("Q")
+        offsets.fromfile(self._index_file, (size - self.HEADER.size) // offsets.itemsize)
+        self._drop_index()
+        self._scan(old_size, offsets)
+        self._save_index(st)
+        return True
+
+    def _drop_index(self):
+        self._index_file.close()
+        self._index_file = None
+        return False
+
+    def _build_index(self, st):
+        self.offsets = array("Q")
+        self._scan(0, self.offsets)
+        self._save_index(st)
+
+    def _scan(self, start, offsets):
+        #one pass over the jokes file from start to find the lines that are jokes (setup|punchline)
+        end = len(self._map)
+        while start < end:
+            newline = self._map.find(b"\n", start)
+            if newline == -1:
+                newline = end
+            if self._parse(self._map[start:newline]) is not None:
+                offsets.append(start)
+            start = newline + 1
+        self.offsets = offsets
+
+    def _save_index(self, st):
+        #save it for next time (written under a temporary name first so other kiosks never see half of it)
+        tmp_name = f"{self.index_filename}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_name, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, tail_crc(self._map, st.st_size), st.st_size, st.st_mtime_ns))
+                self.offsets.tofile(f)
+            os.replace(tmp_name, self.index_filename)
+        except OSError as e:
+            print(f"Couldn't save the joke index ({e}), it will be made again next time.", file=sys.stderr)
+
+    @staticmethod
+    def _parse(line):
+        parts = line.decode("utf-8", "replace").strip().split("|") #the jokes are split by using |.
+        if len(parts) == 2:
+            return (parts[0], parts[1]) #parts [0] are the jokes, while parts [1] are the punchlines.
+        return None
+
+    def tail_crc(self):
+        return tail_crc(self._map, self.size) if self.size else 0
+
+    def appended_since(self, size, crc):
+        #True if the jokes file is an old size byte version of itself (ending in crc) with jokes added
+        return appended_to(self._map if self.size else b"", size, crc)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, n):
+        #read just this joke's line out of the mapped file
+        start = self.offsets[n]
+        end = self._map.find(b"\n", start)
+        return self._parse(self._map[start:] if end == -1 else self._map[start:end])
+
+    def close(self):
+        if self._index_map is not None:
+            self.offsets.release()
+            self._index_map.close()
+        for f in (self._map, self._file, self._index_file):
+            if f is not None:
+                f.close()
+
+
 def load_jokes_from_file(filename):
-    jokes_list = []
-    try:
-        with open(filename, "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split("|") #the jokes are split by using |. 
-                if len(parts) == 2:
-                    jokes_list.append((parts[0], parts[1])) #parts [0] are the jokes, while parts [1] are the punchlines.
-    except FileNotFoundError:
-        print("Jokes file not found.")
-    return jokes_list
+    return JokeCorpus(filename)
 
 jokes = load_jokes_from_file("Advanced Programming/jokes.txt")
 
+#Picking jokes
+#The "bag" sampler tells every joke once, in a random order, before any joke repeats.
+#The "weighted" sampler favours jokes that haven't been told for a while.
+#Set JOKE_SEED to get the same jokes in the same order every run (handy for tests). The bag
+#then always starts a fresh round and doesn't save where it got to.
+SAMPLER = os.environ.get("JOKE_SAMPLER", "bag")
+FRESHNESS = 0.5  #weighted sampler: a joke's weight is multiplied by this each time it's told
+
+class ShuffleBag:
+    #Draws without replacement: each round tells the jokes in the order of a random permutation
+    #of range(size). The permutation is a small Feistel cipher keyed by the round's seed (values
+    #that land past size are encrypted again until they don't), so the nth joke of a round is
+    #worked out directly, a draw is O(1) and nothing is kept per joke. The state saved between
+    #runs is just (number of jokes, round seed, draws so far), so restoring it is O(1) too.
+    ROUNDS = 4
+    MASK64 = (1 << 64) - 1
+
+    def __init__(self, size, rng, state_file=None):
+        self.size = size
+        self.rng = rng
+        self.state_file = state_file
+        self._half = max(1, ((size - 1).bit_length() + 1) // 2)  #bits in each half of a permuted number
+        if not self._load():
+            self._start_round()
+
+    def _start_round(self, seed=None):
+        self.seed = self.rng.getrandbits(64) if seed is None else seed
+        keys = random.Random(self.seed)
+        self._keys = [keys.getrandbits(64) for _ in range(self.ROUNDS)]
+        self.drawn = 0
+
+    def _mix(self, value, key):
+        value = ((value ^ key) * 0x9E3779B97F4A7C15) & self.MASK64
+        value ^= value >> 32
+        value = (value * 0xBF58476D1CE4E5B9) & self.MASK64
+        return value ^ (value >> 29)
+
+    def _permute(self, n):
+        #the joke at position n of this round
+        half, mask = self._half, (1 << self._half) - 1
+        while True:
+            left, right = n >> half, n & mask
+            for key in self._keys:
+                left, right = right, left ^ (self._mix(right, key) & mask)
+            n = (left << half) | right
+            if n < self.size:
+                return n
+
+    def draw(self):
+        if not self.size:
+            raise IndexError("the bag is empty")
+        if self.drawn >= self.size:
+            self._start_round()  #every joke has been told, start again in a new order
+        joke = self._permute(self.drawn)
+        self.drawn += 1
+        self._save()
+        return joke
+
+    def _load(self):
+        if self.state_file is None:
+            return False
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("size") != self.size:
+            return False  #the jokes file changed, start a fresh round
+        self._start_round(state["seed"])
+        self.drawn = min(state["drawn"], self.size)
+        return True
+
+    def _save(self):
+        if self.state_file is None:
+            return
+        tmp_name = f"{self.state_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_name, "w") as f:
+                json.dump({"size": self.size, "seed": self.seed, "drawn": self.drawn}, f)
+            os.replace(tmp_name, self.state_file)
+        except OSError as e:
+            print(f"Couldn't save which jokes have been told ({e}).", file=sys.stderr)
+
+class WeightedSampler:
+    #Draws jokes in proportion to their weights with Vose's alias method: O(n) to build the
+    #table, then O(1) per draw (pick a slot, toss that slot's biased coin).
+    #Lowering a weight doesn't need a rebuild: the table's weights are then an upper bound,
+    #so a draw is kept with probability new weight / table weight and drawn again otherwise.
+    #Raising a weight, or lowering so many that half the draws would be thrown away,
+    #rebuilds the table before the next draw.
+    def __init__(self, weights, rng):
+        self.weights = array("d", weights)
+        self.rng = rng
+        self.total = sum(self.weights)
+        self._dirty = True
+
+    def update(self, n, weight):
+        if weight < 0:
+            raise ValueError("weights can't be negative")
+        self.total += weight - self.weights[n]
+        self.weights[n] = weight
+        if self._dirty or weight > self._table_weights[n] or self.total < self._table_total / 2:
+            self._dirty = True
+
+    def _build(self):
+        n = len(self.weights)
+        self.total = sum(self.weights)
+        if self.total <= 0:
+            raise ValueError("there are no jokes with a weight above 0")
+        self._table_weights = array("d", self.weights)
+        self._table_total = self.total
+        self._prob = array("d", bytes(8 * n))
+        self._alias = array("I", bytes(4 * n))
+        scaled = [w * n / self.total for w in self.weights]
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l  #the rest of slot s belongs to l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+        for i in small + large:
+            self._prob[i] = 1.0  #only rounding left these over
+        self._dirty = False
+
+    def draw(self):
+        if self._dirty:
+            self._build()
+        rng = self.rng
+        while True:
+            n = rng.randrange(len(self._prob))
+            if rng.random() >= self._prob[n]:
+                n = self._alias[n]
+            table_weight = self._table_weights[n]
+            if self.weights[n] == table_weight or rng.random() * table_weight < self.weights[n]:
+                return n
+
+def make_sampler(corpus, mode, rng):
+    if mode == "weighted":
+        return WeightedSampler(array("d", [1.0]) * len(corpus), rng)
+    return ShuffleBag(len(corpus), rng, None if JOKE_SEED else corpus.filename + ".bag")
+
+JOKE_SEED = os.environ.get("JOKE_SEED")
+rng = random.Random(JOKE_SEED)
+sampler = make_sampler(jokes, SAMPLER, rng)
+
+def next_joke():
+    n = sampler.draw()
+    if SAMPLER == "weighted":
+        sampler.update(n, sampler.weights[n] * FRESHNESS)  #less likely again until it's been a while
+    return jokes[n]
+
+#Where jokes come from
+#tell_joke() asks a joke source for the next joke. The local source is jokes.txt (above).
+#Set JOKE_SERVICE=http://host:port to get jokes from a joke service instead: an asyncio event
+#loop on a background thread keeps a buffer of PREFETCH jokes (setup and punchline together),
+#so telling a joke or showing its punchline never waits on the network. Jokes already
+#downloaded are kept in a small LRU cache and aren't downloaded again. If the service is slow
+#or down the buffer runs dry and jokes come from jokes.txt until it's back.
+#"--serve-jokes [port]" runs a stand-in joke service from jokes.txt (JOKE_SERVER_DELAY=seconds
+#makes it slow), and "--bench-source" times the service source against a stand-in server.
+JOKE_SERVICE = os.environ.get("JOKE_SERVICE")
+PREFETCH = 8        #jokes to keep ready (downloaded this many at a time)
+CACHE_SIZE = 256    #downloaded jokes to remember
+TIMEOUT = 2.0       #seconds before giving up on the service
+RETRY_AFTER = 5.0   #seconds to wait before trying the service again
+
+class LocalJokeSource:
+    #jokes from jokes.txt, in the order the sampler picks them
+    def next_joke(self):
+        if not len(jokes):
+            return None
+        return next_joke()
+
+    def close(self):
+        pass
+
+class HttpJokeSource:
+    #Jokes from a joke service: GET /jokes/random?count=n -> {"ids": [...]},
+    #GET /jokes/<id> -> {"id": ..., "setup": ..., "punchline": ...}
+    def __init__(self, url, fallback):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"the joke service has to be an http:// address, not {url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/")
+        self.fallback = fallback
+        self.buffer = deque()     #jokes ready to tell (filled by the loop thread, emptied by Tk)
+        self.cache = OrderedDict()  #joke id -> (setup, punchline), least recently used first
+        self.hits = self.misses = self.fallbacks = 0
+        self.online = True
+        self._wanted = None       #set when the buffer needs topping up
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._prefetch())
+        self._thread = threading.Thread(target=self._run, name="joke prefetch", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def next_joke(self):
+        #called from Tk: never waits, the buffer or jokes.txt always has an answer
+        try:
+            joke = self.buffer.popleft()
+        except IndexError:
+            self.fallbacks += 1
+            joke = self.fallback.next_joke()
+        if self._wanted is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wanted.set)
+        return joke
+
+    async def _prefetch(self):
+        self._wanted = asyncio.Event()
+        while True:
+            if len(self.buffer) >= PREFETCH:
+                self._wanted.clear()
+                await self._wanted.wait()
+                continue
+            try:
+                #a whole batch, not just what's missing now: jokes keep being told while it downloads
+                found = await asyncio.wait_for(self._fetch(PREFETCH), TIMEOUT)
+            except (OSError, ValueError, KeyError, asyncio.TimeoutError) as e:
+                if self.online:
+                    print(f"Joke service unavailable ({str(e) or 'timed out'}), using jokes.txt for now.", file=sys.stderr)
+                self.online = False
+                await asyncio.sleep(RETRY_AFTER)
+                continue
+            if not self.online:
+                print("Joke service is back.", file=sys.stderr)
+            self.online = True
+            self.buffer.extend(found)
+
+    async def _fetch(self, count):
+        ids = (await self._get(f"{self.path}/jokes/random?count={count}"))["ids"]
+        missing = [joke_id for joke_id in dict.fromkeys(ids) if joke_id not in self.cache]
+        self.hits += len(ids) - len(missing)
+        self.misses += len(missing)
+        downloaded = await asyncio.gather(*(self._get(f"{self.path}/jokes/{joke_id}") for joke_id in missing))
+        found = {}
+        for joke in downloaded:
+            found[joke["id"]] = (joke["setup"], joke["punchline"])
+        for joke_id in ids:
+            joke = found.get(joke_id) or self.cache[joke_id]
+            self.cache[joke_id] = joke
+            self.cache.move_to_end(joke_id)
+            found[joke_id] = joke
+        while len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)  #forget the least recently used
+        return [found[joke_id] for joke_id in ids]
+
+    async def _get(self, path):
+        #a plain HTTP/1.1 GET that returns the decoded JSON body
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            status = (await reader.readline()).split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  #headers, the body runs until the connection closes
+            body = await reader.read()
+        finally:
+            writer.close()
+        if len(status) < 2 or status[1] != b"200":
+            raise ValueError(f"GET {path} answered {b' '.join(status[1:]).decode(errors='replace') or 'nothing'}")
+        return json.loads(body)
+
+    def close(self):
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join(timeout=1)
+
+def make_joke_source():
+    local = LocalJokeSource()
+    if not JOKE_SERVICE:
+        return local
+    try:
+        return HttpJokeSource(JOKE_SERVICE, local)
+    except ValueError as e:
+        print(f"{e}, using jokes.txt.", file=sys.stderr)
+        return local
+
+def start_stand_in_server(corpus, host="127.0.0.1", port=0, delay=0.0):
+    #serve corpus like the joke service does, on a background thread. Returns (port, stop).
+    started = threading.Event()
+    state = {}
+
+    async def handle(reader, writer):
+        try:
+            request = (await reader.readline()).split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if delay:
+                await asyncio.sleep(delay)
+            status, body = answer(request[1].decode() if len(request) > 1 else "")
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except OSError:
+            pass  #the client went away
+        finally:
+            writer.close()
+
+    def answer(target):
+        parts = urlsplit(target)
+        if parts.path == "/jokes/random":
+            try:
+                count = min(int(parse_qs(parts.query).get("count", ["1"])[0]), 100)
+            except ValueError:
+                return "400 Bad Request", b"{}"
+            ids = [random.randrange(len(corpus)) for _ in range(count)] if len(corpus) else []
+            return "200 OK", json.dumps({"ids": ids}).encode()
+        if parts.path.startswith("/jokes/") and parts.path[7:].isdigit() and int(parts.path[7:]) < len(corpus):
+            joke_id = int(parts.path[7:])
+            setup, punchline = corpus[joke_id]
+            return "200 OK", json.dumps({"id": joke_id, "setup": setup, "punchline": punchline}).encode()
+        return "404 Not Found", b"{}"
+
+    async def serve():
+        server = await asyncio.start_server(handle, host, port)
+        state["port"] = server.sockets[0].getsockname()[1]
+        state["stop"] = asyncio.Event()
+        started.set()
+        async with server:
+            await state["stop"].wait()
+        handlers = asyncio.all_tasks() - {asyncio.current_task()}
+        if handlers:
+            await asyncio.wait(handlers, timeout=1)  #let requests still being answered finish
+
+    def run():
+        loop.run_until_complete(serve())
+        loop.close()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=run, name="stand-in joke server", daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(state["stop"].set)
+        thread.join(timeout=1)
+    return state["port"], stop
+
+def benchmark_source(tells=100, delay=0.05, reading=0.02):
+    #Tell a joke every reading seconds from a stand-in service that takes delay seconds per
+    #request, then with the service stopped, and print how long each tell took for the caller
+    import time
+    port, stop = start_stand_in_server(jokes, delay=delay)
+    source = HttpJokeSource(f"http://127.0.0.1:{port}", LocalJokeSource())
+    time.sleep(delay * 4)  #let the first buffer fill
+    for label in ("service up", "service down"):
+        timings = []
+        for _ in range(tells):
+            start = time.perf_counter_ns()
+            source.next_joke()
+            timings.append(time.perf_counter_ns() - start)
+            time.sleep(reading)  #someone reading the joke
+        timings.sort()
+        print(f"{label}: {tells} jokes, median {timings[len(timings) // 2] / 1000:.1f} us, "
+              f"max {timings[-1] / 1000:.1f} us, from jokes.txt {source.fallbacks}, "
+              f"cache hits {source.hits}, downloads {source.misses}")
+        source.fallbacks = 0
+        if label == "service up":
+            stop()
+    source.close()
+
+if "--serve-jokes" in sys.argv:
+    at = sys.argv.index("--serve-jokes") + 1
+    port, stop = start_stand_in_server(jokes, port=int(sys.argv[at]) if at < len(sys.argv) else 8765,
+                                       delay=float(os.environ.get("JOKE_SERVER_DELAY", "0")))
+    print(f"Stand-in joke service on http://127.0.0.1:{port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stop()
+    sys.exit(0)
+
+if "--bench-source" in sys.argv:
+    benchmark_source()
+    sys.exit(0)
+
+joke_source = make_joke_source()
+
+
+#Understanding what was typed
+#Commands are matched against a registry of phrases instead of one exact string.
+#Typed text is normalised (case, punctuation, spaces) and looked up in a trie of phrase
+#words. Anything that isn't an exact match is matched word by word with a small edit budget:
+#a misspelt word costs 1, a missing or extra word costs 1, and a phrase is accepted with a
+#total cost of up to 2 (1 for phrases of two words). Only filler words like "please" or
+#"the" can be missing: "tell me a story" isn't "tell me a joke". One word phrases and
+#intents in EXACT_INTENTS (quit) have to be typed exactly. Within that budget a phrase
+#always shares at least one (maybe misspelt) word with what was typed, so only phrases
+#found through an index of their words are ever scored.
+MAX_COST = 2
+EXACT_INTENTS = {"quit"}  #closing the window on a typo is worse than asking again
+FILLER_WORDS = frozenset(("alexa", "please", "tell", "show", "me", "a", "an", "the", "whats", "what",
+                          "can", "you", "i", "say", "something", "some"))
+
+def normalise(text):
+    #"Alexa, tell me a JOKE!" -> ("alexa", "tell", "me", "a", "joke")
+    text = text.lower().replace("'", "")
+    return tuple("".join(c if c.isalnum() else " " for c in text).split())
+
+def edit_distance(a, b, limit):
+    #Edit distance between two words (swapping two neighbouring letters counts as one
+    #mistake), or limit + 1 as soon as it's clearly more than limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        row = [i]
+        for j, cb in enumerate(b, start=1):
+            cost = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            row.append(cost)
+        if min(row) > limit:
+            return limit + 1
+        before, previous = previous, row
+    return previous[-1]
+
+def word_limit(word):
+    #how many typing mistakes a word can have and still count as that word
+    return 1 if len(word) <= 5 else 2
+
+def deletions(word, depth):
+    #every string made by deleting up to depth letters from word (including word itself)
+    found = {word}
+    layer = {word}
+    for _ in range(depth):
+        layer = {w[:i] + w[i + 1:] for w in layer for i in range(len(w))}
+        found |= layer
+    return found
+
+class TrieNode:
+    __slots__ = ("children", "intent", "phrase", "words", "required")
+
+    def __init__(self):
+        self.children = {}  #word -> TrieNode
+        self.intent = None  #set on the last word of a registered phrase
+        self.phrase = None
+        self.words = None   #the phrase's words, for scoring it
+        self.required = None  #for each word, True if it can't be left out
+
+class CommandMatcher:
+    def __init__(self):
+        self.root = TrieNode()
+        self._phrases = {}  #word -> the TrieNodes ending every phrase that uses it
+        self._near = {}     #a word with letters deleted -> the registered words it came from
+        self._similar = {}  #typed word -> registered words within its typo limit (cached)
+
+    def register(self, phrase, intent):
+        words = normalise(phrase)
+        node = self.root
+        for word in words:
+            if word not in node.children:
+                node.children[word] = TrieNode()
+                for near in deletions(word, word_limit(word)):
+                    self._near.setdefault(near, set()).add(word)
+            node = node.children[word]
+        if node.intent is None:
+            for word in set(words):
+                self._phrases.setdefault(word, []).append(node)
+        node.intent, node.phrase, node.words = intent, " ".join(words), words
+        node.required = tuple(word not in FILLER_WORDS for word in words)
+        self._similar.clear()
+
+    def similar_words(self, word):
+        #registered words that word could be a misspelling of, found through the deletion index
+        #(two words are within n edits only if deleting letters from both can make them equal)
+        found = self._similar.get(word)
+        if found is None:
+            candidates = set()
+            for near in deletions(word, 2):
+                candidates |= self._near.get(near, set())
+            found = frozenset(w for w in candidates
+                              if w != word and edit_distance(word, w, word_limit(w)) <= word_limit(w))
+            self._similar[word] = found
+        return found
+
+    def match(self, text):
+        #(intent, phrase, cost) for the closest registered phrase, or None
+        words = normalise(text)
+        if not words:
+            return None
+        node = self.root
+        for word in words:
+            node = node.children.get(word)
+            if node is None:
+                break
+        else:
+            if node.intent is not None:
+                return (node.intent, node.phrase, 0)  #exact match, no fuzzy search needed
+
+        #score the phrases that share a word (or a misspelling of one) with what was typed.
+        #Each typed word a phrase doesn't use costs at least 1, so a phrase within budget
+        #uses one of any MAX_COST + 1 typed words: only the rarest ones need looking up.
+        similar = [self.similar_words(word) for word in words]
+        lookups = []
+        for word, near in zip(words, similar):
+            lists = [self._phrases[w] for w in (word, *near) if w in self._phrases]
+            lookups.append((sum(map(len, lists)), lists))
+        lookups.sort(key=lambda lookup: lookup[0])
+        best = None
+        seen = set()
+        for _, lists in lookups[:MAX_COST + 1]:
+            for nodes in lists:
+                for node in nodes:
+                    if node in seen or abs(len(node.words) - len(words)) > MAX_COST:
+                        continue
+                    seen.add(node)
+                    if len(node.words) == 1 or node.intent in EXACT_INTENTS:
+                        continue  #only ever matched exactly, above
+                    limit = 1 if len(node.words) == 2 else MAX_COST
+                    cost = self._score(node, words, similar, limit)
+                    if cost <= limit and (best is None or cost < best[2]):
+                        best = (node.intent, node.phrase, cost)
+        return best
+
+    @staticmethod
+    def _score(node, words, similar, limit):
+        #word level edit distance: 0 for the same word, 1 for a misspelt, missing or extra
+        #word, 2 for a different filler word (one missing plus one extra). A required word
+        #that's missing or replaced puts it over limit. Stops once over limit.
+        previous = list(range(len(words) + 1))
+        for i, (wanted, required) in enumerate(zip(node.words, node.required), start=1):
+            missing = limit + 1 if required else 1
+            row = [previous[0] + missing]
+            for j, typed in enumerate(words, start=1):
+                swap = 0 if typed == wanted else 1 if wanted in similar[j - 1] else missing + 1
+                row.append(min(previous[j] + missing, row[j - 1] + 1, previous[j - 1] + swap))
+            if min(row) > limit:
+                return limit + 1
+            previous = row
+        return previous[-1]
+
+commands = CommandMatcher()
+COMMAND_PHRASES = {
+    "joke": ("alexa tell me a joke", "tell me a joke", "alexa joke", "joke please", "make me laugh",
+             "say something funny", "tell me another joke", "another joke", "another one"),
+    "punchline": ("show punchline", "show me the punchline", "whats the punchline", "tell me the punchline",
+                  "i give up", "i dont know", "why"),
+    "joke_about": ("alexa tell me a joke about", "tell me a joke about", "joke about", "any jokes about",
+                   "do you know a joke about"),  #the topic comes after "about", see handle_input
+    "help": ("help", "what can you do", "what can i say"),
+    "quit": ("quit", "exit", "goodbye", "alexa stop"),
+}
+for intent, phrases in COMMAND_PHRASES.items():
+    for phrase in phrases:
+        commands.register(phrase, intent)
+
+def benchmark_matcher(extra_phrases=5000, seed=1):
+    #Time matching every prefix of some typed commands (one match per key press) against
+    #the real phrases plus extra_phrases made up ones, and print the cost per key press
+    import time
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9)))
+                  for _ in range(2000)]
+    matcher = CommandMatcher()
+    start = time.perf_counter()
+    for intent, phrases in COMMAND_PHRASES.items():
+        for phrase in phrases:
+            matcher.register(phrase, intent)
+    for n in range(extra_phrases):
+        matcher.register(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 6))), f"extra{n}")
+    built = time.perf_counter() - start
+
+    typed = ["Alexa, tell me a joke!", "alexa tell me a jkoe", "ALEXA please tell me a joke",
+             "what's the punchline?", "i give up", "something else entirely", "help"]
+    timings = []
+    for text in typed:
+        for end in range(1, len(text) + 1):
+            matcher._similar.clear()  #every key press pays for its own word lookups
+            start = time.perf_counter_ns()
+            matcher.match(text[:end])
+            timings.append(time.perf_counter_ns() - start)
+    timings.sort()
+    print(f"{extra_phrases + sum(map(len, COMMAND_PHRASES.values())):,} phrases registered in {built:.2f}s")
+    print(f"{len(timings)} key presses: mean {sum(timings) / len(timings) / 1000:.1f} us, "
+          f"median {timings[len(timings) // 2] / 1000:.1f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)] / 1000:.1f} us, max {timings[-1] / 1000:.1f} us")
+    for text in typed:
+        print(f"  {text!r:32} -> {matcher.match(text)}")
+
+if "--bench-matcher" in sys.argv:
+    benchmark_matcher()
+    sys.exit(0)
+
+
+#Searching jokes
+#"Tell me a joke about pizza" looks the topic up in an inverted index: for every word, the
+#sorted ids of the jokes that use it. It's saved next to the jokes (jokes.txt.words) as a
+#sorted table of words plus their id lists, and memory mapped like the joke index, so a word
+#is found with a binary search and nothing is read for words nobody asks about.
+#Jokes added to the end of jokes.txt since the index was saved are indexed in memory when
+#the app starts, and the saved index is only rewritten once there are a lot of them.
+#Queries: "pizza cheese" and "pizza and cheese" need both words, "pizza or pasta" needs either.
+MERGE_AFTER = 1000  #rewrite the saved index once this many added jokes (or 1/8 of them) aren't in it
+
+def search_terms(text):
+    #words as they're indexed: plurals fold into the singular so "chickens" finds "chicken"
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in normalise(text)]
+
+class Postings:
+    #the sorted ids of the jokes using one word: the saved ones, then ones added since
+    __slots__ = ("saved", "added")
+
+    def __init__(self, saved, added):
+        self.saved = saved
+        self.added = added
+
+    def __len__(self):
+        return len(self.saved) + len(self.added)
+
+    def tolist(self):
+        return list(self.saved) + list(self.added)
+
+    def __contains__(self, joke):
+        #binary search in whichever part would hold it
+        part = self.saved if not self.added or joke < self.added[0] else self.added
+        n = bisect.bisect_left(part, joke)
+        return n < len(part) and part[n] == joke
+
+class JokeSearch:
+    MAGIC = b"JKW1"
+    HEADER = struct.Struct("<4sIQIII4x")  #magic, tail crc and size of the jokes file, jokes, words, bytes of words
+    WORD = struct.Struct("<IIII")  #where the word's text starts, its length, where its ids start, how many ids
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.filename = corpus.filename + ".words"
+        self._file = self._map = None
+        self.saved_jokes = self.word_count = 0
+        self.added = {}  #word -> ids of jokes added since the index was saved
+        if not self._open():
+            self._build()
+            return
+        if len(corpus) > self.saved_jokes:
+            self._index_added()
+            if len(corpus) - self.saved_jokes >= max(MERGE_AFTER, self.saved_jokes // 8):
+                self._build()
+
+    def _open(self):
+        try:
+            self._file = open(self.filename, "rb")
+        except FileNotFoundError:
+            return False
+        header = self._file.read(self.HEADER.size)
+        if len(header) == self.HEADER.size:
+            magic, crc, size, jokes, words, text_size = self.HEADER.unpack(header)
+            if (magic == self.MAGIC and jokes <= len(self.corpus) and self.corpus.appended_since(size, crc)
+                    and (jokes == len(self.corpus) or self.corpus.offsets[jokes] >= size)):
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.saved_jokes, self.word_count = jokes, words
+                self._words_at = self.HEADER.size
+                self._text_at = self._words_at + words * self.WORD.size
+                ids_at = self._text_at + text_size
+                self._ids = memoryview(self._map)[ids_at:].cast("I")
+                return True
+        self._file.close()  #out of date or damaged, make it again
+        self._file = None
+        return False
+
+    def _index_added(self):
+        #jokes past the end of the saved index (ids only go up, so each list stays sorted)
+        for n in range(self.saved_jokes, len(self.corpus)):
+            setup, punchline = self.corpus[n]
+            for word in set(search_terms(f"{setup} {punchline}")):
+                self.added.setdefault(word, array("I")).append(n)
+
+    def _saved(self, word):
+        #binary search the saved word table, returns the word's ids or an empty tuple
+        key = word.encode("utf-8")
+        low, high = 0, self.word_count
+        while low < high:
+            middle = (low + high) // 2
+            text_start, text_len, ids_start, id_count = self.WORD.unpack_from(self._map, self._words_at + middle * self.WORD.size)
+            start = self._text_at + text_start
+            found = self._map[start:start + text_len]
+            if found == key:
+                return self._ids[ids_start:ids_start + id_count]
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        return ()
+
+    def postings(self, word):
+        return Postings(self._saved(word) if self.word_count else (), self.added.get(word, ()))
+
+    def _build(self):
+        #index every joke (including the saved index's words, then the added ones) and save it
+        index = {}
+        if self.word_count:
+            for n in range(self.word_count):
+                text_start, text_len, ids_start, id_count = self.WORD.unpack_from(self._map, self._words_at + n * self.WORD.size)
+                start = self._text_at + text_start
+                index[self._map[start:start + text_len].decode("utf-8")] = array("I", self._ids[ids_start:ids_start + id_count])
+            for word, ids in self.added.items():
+                index.setdefault(word, array("I")).extend(ids)
+        else:
+            for n in range(len(self.corpus)):
+                setup, punchline = self.corpus[n]
+                for word in set(search_terms(f"{setup} {punchline}")):
+                    index.setdefault(word, array("I")).append(n)
+        self.close()
+        self.added = index  #searched from memory this run, from the saved file next time
+        self.saved_jokes = self.word_count = 0
+
+        words = sorted(index)  #str order is the same as utf-8 byte order, so the binary search works on bytes
+        encoded = [word.encode("utf-8") for word in words]
+        text = b"".join(encoded)
+        text += bytes(-len(text) % 4)  #keep the ids 4 byte aligned
+        table = bytearray()
+        text_start = ids_start = 0
+        for word, key in zip(words, encoded):
+            table += self.WORD.pack(text_start, len(key), ids_start, len(index[word]))
+            text_start += len(key)
+            ids_start += len(index[word])
+
+        tmp_name = f"{self.filename}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_name, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.corpus.tail_crc(), self.corpus.size,
+                                         len(self.corpus), len(words), len(text)))
+                f.write(table)
+                f.write(text)
+                for word in words:
+                    index[word].tofile(f)
+            os.replace(tmp_name, self.filename)
+        except OSError as e:
+            print(f"Couldn't save the joke search index ({e}), it will be made again next time.", file=sys.stderr)
+
+    def search(self, query):
+        #sorted ids of the jokes matching query ("pizza", "pizza cheese", "pizza and cheese", "pizza or pasta")
+        groups = [[]]
+        for word in search_terms(query):
+            if word == "or":
+                groups.append([])
+            elif word != "and":
+                groups[-1].append(word)
+        found = [self._all_of(words) for words in groups if words]
+        if len(found) == 1:
+            return found[0]
+        return sorted(set().union(*found))
+
+    def _all_of(self, words):
+        #intersect starting from the rarest word. While the jokes found so far are much fewer
+        #than a word's list, each is checked with a binary search (log n each, not n), otherwise
+        #the two lists are intersected as sets.
+        lists = sorted((self.postings(word) for word in set(words)), key=len)
+        found = lists[0].tolist()
+        for ids in lists[1:]:
+            if not found:
+                break
+            if len(found) * 16 < len(ids):
+                found = [joke for joke in found if joke in ids]
+            else:
+                found = sorted(set(found).intersection(ids.tolist()))
+        return found
+
+    def close(self):
+        if self._map is not None:
+            self._ids.release()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+search = JokeSearch(jokes)
+
+def benchmark_search(joke_count=200000, added=500, seed=1):
+    #Build a made up jokes file in a temporary folder, then time making the search index,
+    #opening it again, opening it after some jokes are appended, and some queries
+    import tempfile
+    import time
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+                  for _ in range(20000)]
+    common = vocabulary[:50]  #a few words turn up in lots of jokes, like "the" and "why" do
+    def made_up_joke():
+        words = [rng.choice(common if rng.random() < 0.4 else vocabulary) for _ in range(rng.randint(6, 14))]
+        return f"{' '.join(words[:len(words) // 2])}?|{' '.join(words[len(words) // 2:])}.\n"
+
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "jokes.txt")
+        with open(filename, "w") as f:
+            f.writelines(made_up_joke() for _ in range(joke_count))
+        timings = []
+        for step in ("build", "reopen", "append"):
+            if step == "append":
+                with open(filename, "a") as f:
+                    f.writelines(made_up_joke() for _ in range(added))
+            start = time.perf_counter()
+            corpus = JokeCorpus(filename)
+            index = JokeSearch(corpus)
+            timings.append(f"{step} {time.perf_counter() - start:.3f}s")
+            if step != "append":
+                index.close()
+                corpus.close()
+        print(f"{joke_count:,} jokes (+{added} appended): " + ", ".join(timings))
+
+        rare, common_word = vocabulary[-1], common[0]
+        for query in (rare, common_word, f"{common_word} {common[1]}", f"{rare} and {common_word}",
+                      f"{rare} or {vocabulary[-2]}"):
+            start = time.perf_counter_ns()
+            found = index.search(query)
+            took = (time.perf_counter_ns() - start) / 1000
+            print(f"  {query!r:34} {len(found):7,} jokes in {took:10.1f} us")
+        index.close()
+        corpus.close()
+
+if "--bench-search" in sys.argv:
+    benchmark_search()
+    sys.exit(0)
+
 current_joke = None
+TOPIC_WORD = "about"
 
 #The main inputs
 def handle_input():
+    #this ensures that the submitted input will work even if the letters aren't capitalized properly (or spelt quite right)
+    text = input_entry.get()
+    words = normalise(text)
+    if TOPIC_WORD in words: #"tell me a joke about pizza": match the part up to "about", search for the rest
+        at = words.index(TOPIC_WORD)
+        matched = commands.match(" ".join(words[:at + 1]))
+        if matched is not None and matched[0] == "joke_about" and words[at + 1:]:
+            tell_joke_about(" ".join(words[at + 1:]))
+            return
+    matched = commands.match(text)
+    if matched is None:
+        joke_label.config(text="Sorry, I didn't catch that. Try: Alexa tell me a Joke") #when user types something we don't know.
+        return
+    COMMAND_ACTIONS[matched[0]]()
+
+def tell_joke():
     global current_joke
-    
-    #this ensures that the submitted input will work even if the letters aren't capitalized properly
-    user_input = input_entry.get().strip().lower() 
-    if user_input == "alexa tell me a joke":
-        current_joke = random.choice(jokes) #random joke generator = their matching punchline 
-        joke_label.config(text=current_joke[0])
-        
-        main_button.config(text="Show Punchline", command=show_punchline) #button to show punchline
-    else:
-        joke_label.config(text="Please type exactly: Alexa tell me a Joke") #when user types different input.
+    joke = joke_source.next_joke() #random joke generator = their matching punchline 
+    if joke is None:
+        joke_label.config(text="Sorry, I don't know any jokes yet.")
+        return
+    current_joke = joke
+    joke_label.config(text=current_joke[0])
+
+    main_button.config(text="Show Punchline", command=show_punchline) #button to show punchline
+
+def tell_joke_about(topic):
+    global current_joke
+    found = search.search(topic)
+    if not found:
+        joke_label.config(text=f"Sorry, I don't know any jokes about {topic}.")
+        return
+    current_joke = jokes[rng.choice(found)]
+    joke_label.config(text=current_joke[0])
+    main_button.config(text="Show Punchline", command=show_punchline)
+
+def ask_topic():
+    joke_label.config(text="A joke about what? Try: 'tell me a joke about chickens'.")
+
+def show_help():
+    joke_label.config(text="Try: 'Alexa tell me a joke', 'tell me a joke about chickens', 'another one', "
+                           "'what's the punchline' or 'quit'.")
 
 def show_punchline():
+    if current_joke is None:
+        joke_label.config(text="Ask me for a joke first!")
+        return
     setup, punchline = current_joke
     joke_label.config(text=f"{setup}\n\n{punchline}") #\n\n is used for spacing to give cleaner look. 
     main_button.config(text="Submit", command=handle_input)
     input_entry.delete(0, tk.END)
 
+#what each intent does
+COMMAND_ACTIONS = {
+    "joke": tell_joke,
+    "joke_about": ask_topic,
+    "punchline": show_punchline,
+    "help": show_help,
+    "quit": lambda: root.quit(),
+}
+
 #GUI settings
 root = tk.Tk()
 root.title("Pink Joke Teller")
 root.geometry("700x500")
 root.config(bg="#ffc0cb")
+tk_profiler.install(root, "Joke Teller") #does nothing unless TK_PROFILE is set
 
 #title heading
 title_label = tk.Label(root, text="Type 'Alexa tell me a Joke' below:",
@@ -73,3 +1078,6 @@ quit_button.grid(row=0, column=1, padx=10)
 
 #loading and running the data:
 root.mainloop()
+joke_source.close()
+search.close()
+jokes.close()
@@ -1,86 +1,150 @@
-import tkinter as tk
-from tkinter import ttk, messagebox #messagebox is for pop up message boxes, often used for alerting the user!
-from tkinter import simpledialog #this helps the user to prompt an input using dialog boxes instead of entry widgets!
+import time
+STARTED = time.perf_counter()  #for --startup-profile, taken before the other imports
 
+import os
+import queue
+import sys
+import threading
 
-#file path for storing student data
-FILE_PATH = "Advanced Programming/studentMarks.txt"
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox #messagebox is for pop up message boxes, often used for alerting the user!
+    import tk_profiler #opt-in callback timing, set TK_PROFILE=1 to turn it on
+except ImportError:
+    tk = None  #servers without Tk can still use the command line commands
 
-# Loading and saving data
-def load_data():
-    students = []  #Empty list to store the student records!
+#The records, storages, batch operations and command line live in student_manager.py,
+#this file is the window on top of them
+import student_manager
+from student_manager import (FILE_PATH, SORT_KEYS, EditBatch, Student, StudentStore, import_numpy,
+                             open_storage, report_errors, summary_lines)
 
-    try:
-        #Open the data file in read mode
-        with open(FILE_PATH, 'r') as f:
-            #Read all lines from the file, strip whitespace, and ignore empty lines
-            lines = [line.strip() for line in f.readlines() if line.strip()]
-
-            #The first line is expected to contain the number of students (not strictly needed)
-            n = int(lines[0])
-
-            #Process each line after the first (each line = one student record)
-            for line in lines[1:]:
-                #Split CSV line into individual fields: id, name, coursework marks, exam mark
-                sid, name, c1, c2, c3, exam = line.split(",")
-
-                #Convert coursework and exam marks from string to integer
-                c1, c2, c3, exam = map(int, (c1, c2, c3, exam))
 
-                #Sum the coursework marks
-                total_course = c1 + c2 + c3
+#(step, seconds since STARTED) for --startup-profile, None when it's off
+startup_marks = None
+
+
+def startup_mark(step):
+    if startup_marks is not None:
+        startup_marks.append((step, time.perf_counter() - STARTED))
+
+
+def print_startup_profile():
+    previous = 0.0
+    print("Startup profile:", file=sys.stderr)
+    for step, at in startup_marks:
+        print(f"  {step:<22}{at * 1000:9.1f} ms  (+{(at - previous) * 1000:.1f} ms)", file=sys.stderr)
+        previous = at
+
+
+#how many matches the student dropdown shows, and how long typing has to pause before searching
+SEARCH_RESULTS = 20
+SEARCH_DELAY_MS = 150
+
+#how often the window checks on background loading and saving
+POLL_MS = 100
+
+#how often the window checks whether another program has changed the marks file
+WATCH_MS = 2000
+
+#set to True once the window is up, until then messages are printed instead
+gui_running = False
+
+
+#messages from worker threads, shown by the window's poll loop (Tk must only be used from one thread)
+message_queue = queue.Queue()
+
+
+def show_message(kind, title, text):
+    #pop up a message box (kind = "info", "warning" or "error") or print it when headless
+    if not gui_running:
+        print(f"{title}: {text}", file=sys.stderr)
+    elif threading.current_thread() is not threading.main_thread():
+        message_queue.put((kind, title, text))
+    else:
+        getattr(messagebox, "show" + kind)(title, text)
+
+
+# Background work section:
+
+class BackgroundTask:
+    #Runs func(*args, progress=...) on a worker thread. The window polls done,
+    #progress, result and error from root.after instead of waiting for it.
+
+    def __init__(self, func, *args):
+        self.done = False
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(func, args), daemon=True)
+        self._thread.start()
+
+    def _run(self, func, args):
+        try:
+            self.result = func(*args, progress=self._report)
+        except Exception as e:
+            self.error = e
+        self.done = True
+
+    def _report(self, fraction):
+        self.progress = fraction
+
+
+class BackgroundSaver:
+    #Saves changes on a worker thread so the window never waits for the disk.
+    #Changes that arrive while a save is running are collected and handed to the
+    #storage together through storage.apply(), so a burst of edits costs one write.
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.busy = False
+        self._pending = []  #(method name, args) waiting for the next write
+        self._closing = False
+        self._wake = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, name, *args):
+        #queue storage.<name>(*args) - Students must be copies the window won't change
+        self.submit_many([(name, args)])
+
+    def submit_many(self, changes):
+        #queue a whole batch of (method name, args) changes so they're saved in the same write
+        with self._wake:
+            self._pending.extend(changes)
+            self.busy = True
+            self._wake.notify()
 
-                #Calculate overall marks including the exam
-                overall = total_course + exam
-
-                #Calculate percentage out of 160 total marks
-                percent = (overall / 160) * 100
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._pending and not self._closing:
+                    self.busy = False
+                    self._wake.wait()
+                if not self._pending:
+                    self.busy = False
+                    return
+                changes, self._pending = self._pending, []
+            try:
+                self.storage.apply(changes)
+            except Exception as e:
+                show_message("error", "Error", f"Saving failed: {e}")  #shown once by the window's poll loop
 
-                #Determine grade based on percentage
-                grade = (
-                    "A" if percent >= 70 else
-                    "B" if percent >= 60 else
-                    "C" if percent >= 50 else
-                    "D" if percent >= 40 else "F"
-                )
+    def close(self):
+        #write whatever is still waiting, then stop the thread
+        with self._wake:
+            self._closing = True
+            self._wake.notify()
+        self._thread.join()
 
-                #Store all relevant information in a dictionary
-                students.append({
-                    "id": sid.strip(),
-                    "name": name.strip(),
-                    "coursework": total_course,
-                    "exam": exam,
-                    "overall": overall,
-                    "percent": percent,
-                    "grade": grade
-                })
-
-        #Print a message confirming the file loaded successfully
-        print(f"Loaded '{FILE_PATH}' successfully.")
-        return students  #Return the list of student dictionaries
-
-    except FileNotFoundError:
-        #If the file doesn't exist, show an error message to the user
-        messagebox.showerror("Error", "File not found")
-        return []  #Return an empty list in case of error
-
-
-def save_data():
-    # save students back to file
-    with open(FILE_PATH, "w") as f:
-        f.write(str(len(students)) + "\n")  #first line = student count
-        for s in students:
-            c_each = s['coursework'] // 3  #split coursework back into 3 parts
-            f.write(f"{s['id']},{s['name']},{c_each},{c_each},{c_each},{s['exam']}\n")
-            # each student on new line
 
 # Display helpers section: 
 
 def format_student(s):
     #make a nice formatted string for output box
     return "{:<35} {:<6} {:<12} {:<10} {:<10} {:<6}\n".format(
-        s['name'], s['id'], s['coursework'], s['exam'],
-        f"{s['percent']:.2f}%", s['grade']
+        s.name, s.id, s.coursework, s.exam,
+        f"{s.percent:.2f}%", s.grade
     )
 
 def show_header():
@@ -90,26 +154,183 @@ def show_header():
     ))
     output.insert(tk.END, "-" * 85 + "\n")  # separator line
 
+class RecordsTable:
+    #A table of student records that only ever holds the rows that can be seen.
+    #Scrolling asks the source (anything with len() and page(start, count)) for the
+    #next page and writes it into the same few Treeview rows, so drawing a cohort of
+    #a million students costs the same as drawing ten.
+
+    COLUMNS = ("Name", "ID", "Coursework", "Exam", "Overall %", "Grade")
+    WIDTHS = (300, 80, 110, 80, 110, 80)
+
+    def __init__(self, parent, visible_rows=12):
+        self.visible_rows = visible_rows
+        self.source = ()
+        self.top = 0  #position of the first visible row
+
+        self.frame = tk.Frame(parent, bg="#f0e5cf")
+        self.tree = ttk.Treeview(self.frame, columns=self.COLUMNS, show="headings",
+                                 height=visible_rows, selectmode="browse")
+        for column, width in zip(self.COLUMNS, self.WIDTHS):
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=width, anchor="w")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        #the Treeview never has more rows than it shows, so wheel scrolling is ours to handle
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_to(self.top + (-3 if e.delta > 0 else 3)))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.top - 3))  #Linux wheel up
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.top + 3))  #Linux wheel down
+
+    def show(self, source, top=None):
+        #display a new (or changed) source, keeping the scroll position unless told otherwise
+        self.source = source
+        self.scroll_to(self.top if top is None else top)
+
+    def on_scroll(self, action, amount, unit=None):
+        #called by the scrollbar with ("moveto", fraction) or ("scroll", n, "units"/"pages")
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.source)))
+        elif unit == "pages":
+            self.scroll_to(self.top + int(amount) * self.visible_rows)
+        else:
+            self.scroll_to(self.top + int(amount))
+
+    def scroll_to(self, top):
+        total = len(self.source)
+        self.top = max(0, min(top, total - self.visible_rows))
+        self.render()
+
+    def render(self):
+        rows = self.source.page(self.top, self.visible_rows) if self.source else []
+        items = self.tree.get_children()
+        #reuse the existing Treeview rows, only adding or removing the difference
+        for i, s in enumerate(rows):
+            values = (s.name, s.id, s.coursework, s.exam, f"{s.percent:.2f}%", s.grade)
+            if i < len(items):
+                self.tree.item(items[i], values=values)
+            else:
+                self.tree.insert("", tk.END, values=values)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+
+        total = len(self.source)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 def refresh_dropdown():
-    #update combobox options with current student names
-    student_dropdown["values"] = [s["name"] for s in students]
+    #update combobox options with the best few matches for what has been typed
+    matches = students.search_index().search(student_var.get(), SEARCH_RESULTS)
+    student_dropdown["values"] = [s.name for s in matches]
+
+def on_dropdown_key(event):
+    #wait until typing pauses before searching, so each key press stays cheap
+    global search_job
+    if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+        return
+    if search_job is not None:
+        root.after_cancel(search_job)
+    search_job = root.after(SEARCH_DELAY_MS, run_search)
+
+def run_search():
+    global search_job
+    search_job = None
+    refresh_dropdown()
+
+def save_change(name, *args):
+    #hand a change to the background saver; Students are copied so later edits can't race the write
+    args = [Student(a.id, a.name, a.coursework, a.exam) if isinstance(a, Student) else a for a in args]
+    saver.submit(name, *args)
+
+def load_students(path, progress):
+    #worker thread: load the records and build the dropdown search index off the Tk thread
+    import_numpy()
+    startup_mark("numpy imported")
+    loaded = storage.load(progress=progress)
+    loaded.search_index()
+    return loaded
+
+def set_buttons_state(state):
+    #enable/disable the action buttons (they're off while the records load)
+    for frame in (btn_frame, indiv_frame):
+        for widget in frame.winfo_children():
+            if isinstance(widget, tk.Button):
+                widget.config(state=state)
+
+def poll_background():
+    #runs every POLL_MS on the Tk thread: shows worker messages, finishes loading, updates the status bar
+    global students, load_task
+    while not message_queue.empty():
+        kind, title, text = message_queue.get()
+        getattr(messagebox, "show" + kind)(title, text)
+
+    if load_task is not None:
+        if load_task.done:
+            if load_task.error is not None:
+                messagebox.showerror("Error", f"Loading failed: {load_task.error}")
+            else:
+                students = load_task.result
+            load_task = None
+            startup_mark("records loaded")
+            progress_bar.pack_forget()
+            set_buttons_state("normal")
+            refresh_dropdown()  #populate combobox
+            view_all()  #show the first page of records
+            if startup_marks is not None:
+                startup_mark("all records shown")
+                print_startup_profile()
+                root.after(0, root.destroy)  #--startup-profile only times the start up
+        else:
+            progress_bar["value"] = load_task.progress * 100
+            status_var.set(f"Loading records... {load_task.progress:.0%}")
+
+    if load_task is None:
+        status_var.set("Saving changes..." if saver.busy else "All changes saved.")
+    root.after(POLL_MS, poll_background)
+
+def watch_file():
+    #runs every WATCH_MS on the Tk thread: merges in changes another program made to the marks file
+    if load_task is None:
+        try:
+            report = storage.sync()
+        except OSError as e:
+            report = None
+            print(f"Couldn't check '{storage.path}' for changes: {e}", file=sys.stderr)
+        if report is not None:
+            report_errors(f"{storage.path} (reloaded)", report["errors"])
+            refresh_dropdown()
+            view_all()
+            output.insert(tk.END, f"\n\nAnother program changed the marks file: {report['added']} added, "
+                                  f"{report['updated']} updated, {report['removed']} removed.")
+            if report["conflicts"]:
+                ids = ", ".join(sid for sid, mine, theirs in report["conflicts"][:10])
+                messagebox.showwarning(
+                    "Conflicting Changes",
+                    f"{len(report['conflicts'])} student(s) were changed here and by another program "
+                    f"({ids}). Your changes were kept. The other program's versions were saved to "
+                    f"'{storage.conflicts_path}'."
+                )
+    root.after(WATCH_MS, watch_file)
 
 
 #The Main menu button actions section: 
 
+def displayed_records():
+    #the store in the order chosen through Sort Student Records (file order until then)
+    key_name, reverse = display_order
+    if key_name is None:
+        return students
+    return students.sorted_view(key_name, reverse)
+
 def view_all():
+    records_table.show(displayed_records())  #only the visible page of rows is drawn
     output.delete("1.0", tk.END)  #clear previous text
-    if not students:
-        output.insert(tk.END, "No student records available.")  #empty case
-        return
-    show_header()
-    total_percent = 0
-    for s in students:
-        output.insert(tk.END, format_student(s))  #add student row
-        total_percent += s["percent"]  #sum for average
-    avg = total_percent / len(students)  #calculate average
-    output.insert(tk.END, "\nTotal Students: {}\n".format(len(students)))
-    output.insert(tk.END, "Average Percentage: {:.2f}%\n".format(avg))
+    #running totals plus one vectorized pass for the percentiles, no rows are rescanned
+    output.insert(tk.END, "\n".join(summary_lines(students)))
 
 def view_individual():
     output.delete("1.0", tk.END)
@@ -117,17 +338,17 @@ def view_individual():
     if not sel:
         output.insert(tk.END, "Please select a student.")  #no selection
         return
-    for s in students:
-        if s["name"] == sel:  # match by name
-            show_header()
-            output.insert(tk.END, format_student(s))
-            return
+    matches = students.find(sel)  # match by name or id
+    if matches:
+        show_header()
+        output.insert(tk.END, format_student(matches[0]))
+        return
     output.insert(tk.END, f"No record found for {sel}")  #not found
 
 def show_highest():
     output.delete("1.0", tk.END)
     if not students: return
-    best = max(students, key=lambda s: s["overall"])  #max overall marks
+    best = students.stats.highest()  #max overall marks
     output.insert(tk.END, "Highest Scorer:\n\n")
     show_header()
     output.insert(tk.END, format_student(best))
@@ -135,7 +356,7 @@ def show_highest():
 def show_lowest():
     output.delete("1.0", tk.END)
     if not students: return
-    worst = min(students, key=lambda s: s["overall"])  #min overall marks
+    worst = students.stats.lowest()  #min overall marks
     output.insert(tk.END, "Lowest Scorer:\n\n")
     show_header()
     output.insert(tk.END, format_student(worst))
@@ -144,14 +365,33 @@ def sort_records():
     if not students:
         messagebox.showinfo("No Data", "No records to sort.")  # nothing to do
         return
-    choice = messagebox.askquestion("Sort Order", "Sort ascending by name? (No = descending)")
-    ascending = (choice == "yes")  #convert yes/no to boolean
-    # sort list in place
-    students.sort(key=lambda s: s["name"].lower(), reverse=not ascending)
-    save_data()  #save sorted list
-    refresh_dropdown()  #update combobox
-    view_all()  #refresh text display
-    messagebox.showinfo("Sorted", "Student records sorted successfully!")
+    sort_win = tk.Toplevel(root)  #new window
+    sort_win.title("Sort Student Records")
+    sort_win.geometry("350x220")
+    sort_win.configure(bg="#f5deb3")
+    sort_win.resizable(False, False)
+
+    tk.Label(sort_win, text="Sort by:", font=("Times New Roman", 12, "bold"),
+             bg="#f5deb3").pack(pady=15)
+    key_var = tk.StringVar(value=display_order[0] or "name")
+    ttk.Combobox(sort_win, textvariable=key_var, font=("Times New Roman", 12),
+                 values=list(SORT_KEYS), state="readonly", width=22).pack(pady=5)
+
+    def apply_order(ascending):
+        # only the displayed order changes - the data file is left alone
+        global display_order
+        display_order = (key_var.get(), not ascending)
+        view_all()  #refresh display
+        sort_win.destroy()
+
+    btn_row = tk.Frame(sort_win, bg="#f5deb3")
+    btn_row.pack(pady=20)
+    tk.Button(btn_row, text="Ascending", bg="#8b4513", fg="white",
+              font=("Times New Roman", 12, "bold"), relief="raised", bd=3, width=12,
+              command=lambda: apply_order(True)).grid(row=0, column=0, padx=6)
+    tk.Button(btn_row, text="Descending", bg="#a0522d", fg="white",
+              font=("Times New Roman", 12, "bold"), relief="raised", bd=3, width=12,
+              command=lambda: apply_order(False)).grid(row=0, column=1, padx=6)
 
 
 #Adding new or deleting student records area: 
@@ -222,33 +462,19 @@ def manage_students_window():
                 messagebox.showerror("Error", "Please enter valid numeric scores.")
                 return
 
-            #Calculate totals and percentages
-            total_course = c1 + c2 + c3
-            overall = total_course + exam
-            percent = (overall / 160) * 100
-
-            #Determine grade based on percentage
-            grade = (
-                "A" if percent >= 70 else
-                "B" if percent >= 60 else
-                "C" if percent >= 50 else
-                "D" if percent >= 40 else
-                "F"
-            )
-
-            #Add the student as a dictionary to the global students list
-            students.append({
-                "id": sid,
-                "name": name,
-                "coursework": total_course,
-                "exam": exam,
-                "overall": overall,
-                "percent": percent,
-                "grade": grade
-            })
+            #Add the student to the global store (overall, percent and grade are worked out by Student)
+            s = Student(sid, name, c1 + c2 + c3, exam)
+            try:
+                for field, value in (("id", sid), ("name", name), ("coursework", s.coursework), ("exam", exam)):
+                    storage.check(field, value)
+                students.add(s)
+            except ValueError as e:
+                # the id index rejects duplicate ids, and the storage values it can't save
+                messagebox.showerror("Error", str(e))
+                return
 
             #Save data to file after adding
-            save_data()
+            save_change("put", s)
 
             #Update UI elements
             refresh_dropdown()  # refresh combobox with new student
@@ -287,13 +513,13 @@ def manage_students_window():
 
         def confirm_delete():
             name = entry.get().strip()  #get input and remove spaces
-            before = len(students)
             # remove any student that matches name or ID
-            students[:] = [s for s in students if s["name"].lower() != name.lower() and s["id"] != name]
-            if len(students) == before:
+            removed = students.remove_matching(name)
+            if not removed:
                 messagebox.showinfo("Not Found", "No matching record found.")  # nothing removed
             else:
-                save_data()  # save updated list
+                for s in removed:
+                    save_change("delete", s.id)  # save the deletions
                 refresh_dropdown()  # update combobox
                 view_all()  # refresh main display
                 messagebox.showinfo("Deleted", f"Record for '{name}' deleted successfully.")
@@ -361,57 +587,44 @@ def update_student():
             messagebox.showerror("Error", "Please fill all fields.")
             return
 
-        #Loop through all students to find the matching record
-        for s in students:
-            if s["name"].lower() == name_id.lower() or s["id"] == name_id:
-                try:
-                    #Determine which field to update and apply new value
-                    if field == "coursework":
-                        s["coursework"] = int(value)  #must be an integer
-                    elif field == "exam":
-                        s["exam"] = int(value)        #must be an integer
-                    elif field == "name":
-                        s["name"] = value             #updating name
-                    elif field == "id":
-                        s["id"] = value               #update ID
-                    else:
-                        messagebox.showerror("Error", "Invalid field selected.")
-                        return
-                except ValueError:
-                    # Handle non-numeric input for coursework or exam
-                    messagebox.showerror(
-                        "Error", "Please enter a valid numeric value for coursework/exam."
-                    )
-                    return
-
-                # Recalculate totals, percentage, and grade after update
-                s["overall"] = s["coursework"] + s["exam"]
-                s["percent"] = (s["overall"] / 160) * 100
-                s["grade"] = (
-                    "A" if s["percent"] >= 70 else
-                    "B" if s["percent"] >= 60 else
-                    "C" if s["percent"] >= 50 else
-                    "D" if s["percent"] >= 40 else "F"
-                )
-
-                # Save changes to file and refresh UI
-                save_data()           #save updated data
-                refresh_dropdown()    #refresh combobox with updated student info
-                view_all()            #refresh main display table
+        #Look the student up in the id/name indexes
+        matches = students.find(name_id)
+        if not matches:
+            #If no student matches the input name/ID, inform the user
+            messagebox.showinfo(
+                "Not Found", f"No student found with name or ID '{name_id}'."
+            )
+            return
+        s = matches[0]
+        old_id = s.id
+
+        try:
+            #Apply the new value to the chosen field (the storage checks it can be saved,
+            #then the store checks it and re-indexes)
+            storage.check(field, value)
+            students.update(s, field, value)
+        except ValueError as e:
+            # Handle non-numeric marks, an invalid field or an id that is already taken
+            messagebox.showerror("Error", str(e))
+            return
 
-                #Notify user of successful update
-                messagebox.showinfo(
-                    "Updated", f"Record for {s['name']} updated successfully."
-                )
+        # Totals, percentage, and grade are recalculated by Student on access
 
-                upd_win.destroy()  #Close the update window
-                return  #Exit function after updating
+        # Save changes to file and refresh UI
+        if field == "id":
+            save_change("rename", old_id, s.id)  #save the new id
+        else:
+            save_change("put", s)                #save updated data
+        refresh_dropdown()    #refresh combobox with updated student info
+        view_all()            #refresh main display table
 
-        #If no student matches the input name/ID, inform the user
+        #Notify user of successful update
         messagebox.showinfo(
-            "Not Found", f"No student found with name or ID '{name_id}'."
+            "Updated", f"Record for {s.name} updated successfully."
         )
 
+        upd_win.destroy()  #Close the update window
+
     #Create the Update button and link it to submit_update()
     tk.Button(
         upd_win, text="Update Record", bg="#8b4513", fg="white",
@@ -419,102 +632,201 @@ def update_student():
         width=20, command=submit_update
     ).pack(pady=20)
 
+def apply_edits_file():
+    #Apply a file of name-or-id,field,value edits as one batch: all of them or none,
+    #saved in one write with one refresh of the table at the end
+    from tkinter import filedialog  #only needed here, so it isn't imported at start up
+    path = filedialog.askopenfilename(
+        title="Apply Edits From File",
+        filetypes=[("Edit files", "*.txt *.csv"), ("All files", "*.*")]
+    )
+    if not path:
+        return  #cancelled
+
+    batch = EditBatch(students)
+    errors = []
+    try:
+        with open(path, "r") as f:
+            batch.read(f, errors)
+    except OSError as e:
+        messagebox.showerror("Error", f"Couldn't read '{path}': {e}")
+        return
+    errors.extend(batch.validate())  #every edit is checked before any is made
+    if errors:
+        lines = [f"Line {line_no}: {message}" for line_no, message, line in errors[:10]]
+        if len(errors) > 10:
+            lines.append(f"...and {len(errors) - 10} more.")
+        messagebox.showerror("Edits Not Applied",
+                             f"{len(errors)} edit(s) can't be made, so none were applied:\n\n" + "\n".join(lines))
+        return
+    if not len(batch):
+        messagebox.showinfo("No Edits", f"No edits found in '{os.path.basename(path)}'.")
+        return
+
+    try:
+        changes = batch.commit()
+    except ValueError as e:
+        messagebox.showerror("Edits Not Applied", f"{e}\n\nNo edits were applied.")
+        return
+    saver.submit_many(changes)  #one save for the whole batch
+    refresh_dropdown()
+    view_all()
+    messagebox.showinfo("Edits Applied", f"Applied {len(batch)} edit(s) from '{os.path.basename(path)}'.")
+
 #The Main GUI setup ---
 
-root = tk.Tk()
-root.title("Student Manager")
-root.geometry("950x700")
-root.configure(bg="#f0e5cf")
-
-#title label
-title = tk.Label(root, text="Student Manager",
-                 font=("Times New Roman", 22, "bold"),
-                 bg="#d2b48c", fg="#3b2f2f", pady=10, padx=20,
-                 relief="ridge", bd=4)
-title.pack(pady=10)
-
-#button frame
-btn_frame = tk.Frame(root, bg="#f0e5cf")
-btn_frame.pack(pady=10)
-
-#common button style
-button_style = {
-    "font": ("Times New Roman", 13, "bold"),
-    "relief": "raised", "bd": 3,
-    "width": 22, "height": 2, "cursor": "hand2"
-}
-
-# main menu buttons settings
-tk.Button(btn_frame, text="View All Student Records",
-          bg="#f5deb3", fg="#3b2f2f", command=view_all, **button_style).grid(row=0, column=0, padx=6)
-tk.Button(btn_frame, text="Show Highest Score",
-          bg="#deb887", fg="#3b2f2f", command=show_highest, **button_style).grid(row=0, column=1, padx=6)
-tk.Button(btn_frame, text="Show Lowest Score",
-          bg="#cd853f", fg="white", command=show_lowest, **button_style).grid(row=0, column=2, padx=6)
-tk.Button(btn_frame, text="Sort Student Records",
-          bg="#e0c097", fg="#3b2f2f", command=sort_records, **button_style).grid(row=1, column=0, padx=6, pady=8)
-tk.Button(btn_frame, text="Manage Students (Add/Delete)",
-          bg="#b8860b", fg="white", command=manage_students_window, **button_style).grid(row=1, column=1, padx=6, pady=8)
-tk.Button(btn_frame, text="Update Student Record",
-          bg="#8b4513", fg="white", command=update_student, **button_style).grid(row=1, column=2, padx=6, pady=8)
-
-
-# Viewing individual record frame section
-indiv_frame = tk.LabelFrame(
-    root, 
-    text="View Individual Record",     
-    font=("Times New Roman", 14, "bold"),   
-    bg="#f0e5cf", fg="#3b2f2f",                       
-    bd=4, relief="groove", #Border style
-    padx=10, pady=10                                   
-)
-indiv_frame.pack(pady=15) #Add some space below the frame
-
-#Create a Tkinter StringVar to store the selected student from the dropdown
-student_var = tk.StringVar()
-
-#Combobox to allow user to select a student
-student_dropdown = ttk.Combobox(
-    indiv_frame, textvariable=student_var, #Link selection to student_var
-    font=("Courier New", 12, "bold"),         
-    width=25  #Width of dropdown section
-)
-student_dropdown.grid(row=0, column=0, padx=10, pady=5)
-
-#Button to view the selected student's record
-tk.Button(
-    indiv_frame, 
-    text="View Record",                       
-    font=("Times New Roman", 12, "bold"),     
-    bg="#a0522d", fg="white",         
-    relief="raised", bd=3, width=18, height=1, 
-    command=view_individual      #Function called when clicked
-).grid(row=0, column=1, padx=10) #Place next to dropdown
-
-#Output display setting
-
-#Create a labeled frame to hold the output text box for student records
-output_frame = tk.LabelFrame(
-    root, 
-    text="Student Records Display",                
-    font=("Times New Roman", 14, "bold"),        
-    bg="#f0e5cf", fg="#3b2f2f",             
-    bd=4, relief="groove",            
-    padx=10, pady=10                              
-)
-output_frame.pack(fill="both", expand=True, padx=15, pady=10)  #Fill space and add margins
-
-#Text widget to display student records
-output = tk.Text(
-    output_frame, 
-    height=20, width=100,                            
-    font=("Courier New", 12, "bold"),                
-    bg="#fff8dc", fg="#3b2f2f",  
-    relief="sunken", bd=3                             
-)
-output.pack(fill="both", expand=True, pady=5) # Fill the frame and allow resizing
-
-#Loading data and start GUI
-students = load_data()  #load student data from file
-refresh_dropdown()  #populate combobox
-root.mainloop()  #start tkinter
+def start_loading():
+    #Runs once the window has been drawn: show the first page straight from the file,
+    #then load everything else on a worker thread behind it
+    global load_task
+    root.update_idletasks()
+    startup_mark("window drawn")
+    try:
+        records_table.show(storage.preview(records_table.visible_rows))
+    except (OSError, ValueError) as e:
+        print(f"Couldn't read the first page of '{storage.path}': {e}", file=sys.stderr)
+    root.update_idletasks()
+    startup_mark("first page shown")
+    load_task = BackgroundTask(load_students, storage.path)  #load student data from file (and replay the journal)
+
+def run_gui(path=FILE_PATH, profile=False):
+    global root, student_var, student_dropdown, search_job, records_table, output
+    global storage, students, display_order, gui_running
+    global btn_frame, indiv_frame, status_var, progress_bar, saver, load_task
+    global startup_marks
+
+    if profile:
+        startup_marks = []
+        startup_mark("modules imported")
+
+    root = tk.Tk()
+    root.title("Student Manager")
+    root.geometry("950x700")
+    root.configure(bg="#f0e5cf")
+    tk_profiler.install(root, "Student Manager") #does nothing unless TK_PROFILE is set
+
+    #title label
+    title = tk.Label(root, text="Student Manager",
+                     font=("Times New Roman", 22, "bold"),
+                     bg="#d2b48c", fg="#3b2f2f", pady=10, padx=20,
+                     relief="ridge", bd=4)
+    title.pack(pady=10)
+
+    #button frame
+    btn_frame = tk.Frame(root, bg="#f0e5cf")
+    btn_frame.pack(pady=10)
+
+    #common button style
+    button_style = {
+        "font": ("Times New Roman", 13, "bold"),
+        "relief": "raised", "bd": 3,
+        "width": 22, "height": 2, "cursor": "hand2"
+    }
+
+    # main menu buttons settings
+    tk.Button(btn_frame, text="View All Student Records",
+              bg="#f5deb3", fg="#3b2f2f", command=view_all, **button_style).grid(row=0, column=0, padx=6)
+    tk.Button(btn_frame, text="Show Highest Score",
+              bg="#deb887", fg="#3b2f2f", command=show_highest, **button_style).grid(row=0, column=1, padx=6)
+    tk.Button(btn_frame, text="Show Lowest Score",
+              bg="#cd853f", fg="white", command=show_lowest, **button_style).grid(row=0, column=2, padx=6)
+    tk.Button(btn_frame, text="Sort Student Records",
+              bg="#e0c097", fg="#3b2f2f", command=sort_records, **button_style).grid(row=1, column=0, padx=6, pady=8)
+    tk.Button(btn_frame, text="Manage Students (Add/Delete)",
+              bg="#b8860b", fg="white", command=manage_students_window, **button_style).grid(row=1, column=1, padx=6, pady=8)
+    tk.Button(btn_frame, text="Update Student Record",
+              bg="#8b4513", fg="white", command=update_student, **button_style).grid(row=1, column=2, padx=6, pady=8)
+    tk.Button(btn_frame, text="Apply Edits From File",
+              bg="#a0522d", fg="white", command=apply_edits_file, **button_style).grid(row=2, column=1, padx=6)
+
+
+    # Viewing individual record frame section
+    indiv_frame = tk.LabelFrame(
+        root, 
+        text="View Individual Record",     
+        font=("Times New Roman", 14, "bold"),   
+        bg="#f0e5cf", fg="#3b2f2f",                       
+        bd=4, relief="groove", #Border style
+        padx=10, pady=10                                   
+    )
+    indiv_frame.pack(pady=15) #Add some space below the frame
+
+    #Create a Tkinter StringVar to store the selected student from the dropdown
+    student_var = tk.StringVar()
+
+    #Combobox to allow user to select a student
+    student_dropdown = ttk.Combobox(
+        indiv_frame, textvariable=student_var, #Link selection to student_var
+        font=("Courier New", 12, "bold"),         
+        width=25  #Width of dropdown section
+    )
+    student_dropdown.grid(row=0, column=0, padx=10, pady=5)
+    student_dropdown.bind("<KeyRelease>", on_dropdown_key)  #type-ahead search
+    search_job = None  #pending root.after search while the user is typing
+
+    #Button to view the selected student's record
+    tk.Button(
+        indiv_frame, 
+        text="View Record",                       
+        font=("Times New Roman", 12, "bold"),     
+        bg="#a0522d", fg="white",         
+        relief="raised", bd=3, width=18, height=1, 
+        command=view_individual      #Function called when clicked
+    ).grid(row=0, column=1, padx=10) #Place next to dropdown
+
+    #Output display setting
+
+    #Create a labeled frame to hold the output text box for student records
+    output_frame = tk.LabelFrame(
+        root, 
+        text="Student Records Display",                
+        font=("Times New Roman", 14, "bold"),        
+        bg="#f0e5cf", fg="#3b2f2f",             
+        bd=4, relief="groove",            
+        padx=10, pady=10                              
+    )
+    output_frame.pack(fill="both", expand=True, padx=15, pady=10)  #Fill space and add margins
+
+    #Table that shows the visible page of student records
+    records_table = RecordsTable(output_frame)
+    records_table.frame.pack(fill="both", expand=True, pady=5)
+
+    #Text widget to display the summary and single student records
+    output = tk.Text(
+        output_frame, 
+        height=6, width=100,                            
+        font=("Courier New", 12, "bold"),                
+        bg="#fff8dc", fg="#3b2f2f",  
+        relief="sunken", bd=3                             
+    )
+    output.pack(fill="both", expand=True, pady=5) # Fill the frame and allow resizing
+
+    #Status bar for background loading and saving
+    status_frame = tk.Frame(root, bg="#f0e5cf")
+    status_frame.pack(fill="x", padx=15, pady=(0, 8))
+    status_var = tk.StringVar(value="Loading records...")
+    tk.Label(status_frame, textvariable=status_var, font=("Times New Roman", 11),
+             bg="#f0e5cf", fg="#3b2f2f", anchor="w").pack(side="left")
+    progress_bar = ttk.Progressbar(status_frame, length=250, mode="determinate", maximum=100)
+    progress_bar.pack(side="right")
+
+    #Loading data and start GUI - the window shows straight away while the records load
+    gui_running = True  #messages go to message boxes from now on
+    student_manager.message_handler = show_message  #including the ones from the records and storages
+    storage = open_storage(path)  #journal next to the marks file, SQLite for .db, mmap for .bin
+    students = StudentStore()  #empty until the background load finishes
+    display_order = (None, False)  #(sort key name, descending) - None keeps the file order
+    set_buttons_state("disabled")
+    load_task = None  #started by start_loading once the window is on screen
+    saver = BackgroundSaver(storage)  #saves changes off the Tk thread
+    startup_mark("window built")
+    root.after_idle(start_loading)
+    root.after(POLL_MS, poll_background)
+    root.after(WATCH_MS, watch_file)  #pick up rows the nightly import appends while we're open
+    root.mainloop()  #start tkinter
+    saver.close()  #finish any save still waiting
+    storage.close()  #fold the journal into the marks file before exiting
+
+
+if __name__ == "__main__":
+    sys.exit(student_manager.main(gui=run_gui if tk is not None else None))
@@ -0,0 +1,2701 @@
+#The Student Manager without its window: the Student records, the StudentStore and
+#its indexes, the storages (marks text file with a journal, SQLite and binary records),
+#the batch operations and the command line. "03 - Student Manager (Extended Exercise).py"
+#is the Tkinter front end over this module; anything else (tests, other tools) can
+#import it directly.
+
+import argparse
+import bisect
+import csv
+import gc
+import glob
+import heapq
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+from array import array
+#sqlite3, tempfile, tracemalloc, platform and concurrent.futures are imported by the few
+#functions that use them, so opening the window doesn't wait for them
+
+#numpy is optional - it makes the summary figures one vectorized pass over big cohorts.
+#It takes longer to import than everything else put together, so import_numpy() is
+#called once the window is up (or straight away for the command line commands).
+np = None
+
+
+def import_numpy():
+    global np
+    try:
+        import numpy
+    except ImportError:
+        return
+    np = numpy
+
+
+#file path for storing student data
+FILE_PATH = "Advanced Programming/studentMarks.txt"
+
+#how many parsed rows load_data() collects before adding them to the store in one go
+LOAD_CHUNK = 50000
+
+#set STUDENT_STATS_CHECK=1 to check the running statistics against a full recount after every change
+STATS_CHECK = os.environ.get("STUDENT_STATS_CHECK") == "1"
+
+#total marks available (3 coursework marks out of 20 + exam out of 100)
+MAX_MARKS = 160
+
+
+#grade letters and the lowest percentage needed for each (anything below the last is an F)
+GRADES = ("A", "B", "C", "D", "F")
+GRADE_BOUNDARIES = (70, 60, 50, 40)
+
+
+class GradingPolicy:
+    #A set of grade boundaries (lowest percentage for each grade but the last) over
+    #max_marks. The grade of every whole overall mark from 0 to max_marks is worked out
+    #once into a lookup table, so grading a student is one index instead of a chain of
+    #comparisons, and a whole cohort can be graded at once with numpy.
+
+    def __init__(self, boundaries=GRADE_BOUNDARIES, max_marks=MAX_MARKS, grades=GRADES):
+        boundaries = tuple(boundaries)
+        if len(boundaries) != len(grades) - 1:
+            raise ValueError(f"expected {len(grades) - 1} boundaries for grades {', '.join(grades)}")
+        if any(high <= low for high, low in zip(boundaries, boundaries[1:])):
+            raise ValueError("boundaries must go from highest to lowest")
+        if max_marks <= 0:
+            raise ValueError("max marks must be more than 0")
+        self.boundaries = boundaries
+        self.max_marks = max_marks
+        self.grades = tuple(grades)
+        #table[overall] is the position of that mark's grade in self.grades
+        self.table = bytes(self._grade_index((overall / max_marks) * 100) for overall in range(max_marks + 1))
+
+    @classmethod
+    def parse(cls, text, max_marks=MAX_MARKS):
+        #"70,60,50,40" -> GradingPolicy, raises ValueError if it isn't a valid policy
+        try:
+            boundaries = [float(part) for part in text.split(",")]
+        except ValueError:
+            raise ValueError(f"boundaries should be numbers separated by commas, not {text!r}") from None
+        return cls(boundaries, max_marks)
+
+    def _grade_index(self, percent):
+        for i, boundary in enumerate(self.boundaries):
+            if percent >= boundary:
+                return i
+        return len(self.boundaries)
+
+    def grade(self, overall):
+        if 0 <= overall <= self.max_marks:
+            return self.grades[self.table[overall]]
+        #marks outside the table (bad data) still get a grade
+        return self.grades[self._grade_index((overall / self.max_marks) * 100)]
+
+    def grade_counts(self, overall):
+        #grade -> number of students for a whole column of overall marks
+        if np is not None:
+            table = np.frombuffer(self.table, dtype=np.uint8)  #a view of the same bytes, nothing is copied
+            marks = np.clip(np.asarray(overall, dtype=np.int64), 0, self.max_marks)  #int even when empty
+            counts = np.bincount(table[marks], minlength=len(self.grades))
+            return dict(zip(self.grades, (int(n) for n in counts)))
+        counts = dict.fromkeys(self.grades, 0)
+        for mark in overall:
+            counts[self.grade(mark)] += 1
+        return counts
+
+    def describe(self):
+        parts = [f"{g} >= {b:g}%" for g, b in zip(self.grades, self.boundaries)]
+        return ", ".join(parts) + f", otherwise {self.grades[-1]} (out of {self.max_marks} marks)"
+
+
+#the policy used everywhere unless the regrade command is given a different one
+DEFAULT_POLICY = GradingPolicy()
+
+
+class Student:
+    #A compact student record. __slots__ stops python creating a dict for every
+    #row, and overall/percent/grade are worked out when asked for instead of stored.
+    __slots__ = ("id", "name", "coursework", "exam")
+
+    def __init__(self, sid, name, coursework, exam):
+        self.id = sid
+        self.name = name
+        self.coursework = coursework  #total of the three coursework marks
+        self.exam = exam
+
+    @property
+    def overall(self):
+        return self.coursework + self.exam
+
+    @property
+    def percent(self):
+        return (self.overall / MAX_MARKS) * 100
+
+    @property
+    def grade(self):
+        return DEFAULT_POLICY.grade(self.overall)
+
+    def __repr__(self):
+        return f"Student({self.id!r}, {self.name!r}, {self.coursework}, {self.exam})"
+
+
+# Columnar store section:
+
+class StudentColumns:
+    #Keeps the marks of every student in contiguous arrays (one array per column)
+    #so the mark counts and percentiles can be worked out in one pass without
+    #touching each Student object.
+    #Deleted rows are only marked as dead so removing a student never shifts the arrays.
+
+    def __init__(self, students=()):
+        self.rebuild(students)
+
+    def rebuild(self, students):
+        #start again from a list of students
+        self._rows = {}      #Student -> row number
+        self._free = []      #rows of deleted students that can be reused
+        self._size = 0
+        self._percentiles = {}  #quantiles -> percentiles, until the marks next change
+        self._numpy = np is not None  #numpy arrays if it's been imported by now, array module arrays if not
+        if self._numpy:
+            self._coursework = np.zeros(16, dtype=np.int32)
+            self._exam = np.zeros(16, dtype=np.int32)
+            self._overall = np.zeros(16, dtype=np.int32)
+            self._percent = np.zeros(16, dtype=np.float64)
+            self._live = np.zeros(16, dtype=bool)
+        else:
+            self._coursework = array("i")
+            self._exam = array("i")
+            self._overall = array("i")
+            self._percent = array("d")
+            self._live = bytearray()
+        for s in students:
+            self.add(s)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _grow(self):
+        #double the numpy arrays when they are full (the array module grows by itself)
+        if not self._numpy or self._size < len(self._live):
+            return
+        capacity = len(self._live) * 2
+        for name in ("_coursework", "_exam", "_overall", "_percent", "_live"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _write(self, row, s):
+        self._coursework[row] = s.coursework
+        self._exam[row] = s.exam
+        self._overall[row] = s.overall
+        self._percent[row] = s.percent
+        self._live[row] = True
+
+    def add(self, s):
+        if self._free:
+            row = self._free.pop()  #reuse a deleted row
+        else:
+            row = self._size
+            if self._numpy:
+                self._grow()
+            else:
+                for column in (self._coursework, self._exam, self._overall, self._percent):
+                    column.append(0)
+                self._live.append(0)
+            self._size += 1
+        self._rows[s] = row
+        self._write(row, s)
+        self._percentiles.clear()
+
+    def extend(self, students):
+        #add a list of students at the end with one slice assignment per column
+        start, n = self._size, len(students)
+        for row, s in enumerate(students, start):
+            self._rows[s] = row
+        coursework = [s.coursework for s in students]
+        exam = [s.exam for s in students]
+        if self._numpy:
+            capacity = len(self._live)
+            while capacity < start + n:
+                capacity *= 2
+            if capacity > len(self._live):
+                for name in ("_coursework", "_exam", "_overall", "_percent", "_live"):
+                    old = getattr(self, name)
+                    new = np.zeros(capacity, dtype=old.dtype)
+                    new[:start] = old[:start]
+                    setattr(self, name, new)
+            end = start + n
+            self._coursework[start:end] = coursework
+            self._exam[start:end] = exam
+            self._overall[start:end] = self._coursework[start:end] + self._exam[start:end]
+            self._percent[start:end] = self._overall[start:end] / MAX_MARKS * 100
+            self._live[start:end] = True
+        else:
+            overall = [c + e for c, e in zip(coursework, exam)]
+            self._coursework.extend(coursework)
+            self._exam.extend(exam)
+            self._overall.extend(overall)
+            self._percent.extend((o / MAX_MARKS) * 100 for o in overall)
+            self._live.extend(b"\1" * n)
+        self._size += n
+        self._percentiles.clear()
+
+    def update(self, s):
+        #copy the marks of a changed student back into the arrays
+        self._write(self._rows[s], s)
+        self._percentiles.clear()
+
+    def remove(self, s):
+        row = self._rows.pop(s)
+        self._live[row] = False
+        self._free.append(row)
+        self._percentiles.clear()
+
+    #StudentStore events
+    def student_added(self, s):
+        self.add(s)
+
+    def students_added(self, students):
+        self.extend(students)
+
+    def student_removed(self, s):
+        self.remove(s)
+
+    def student_changed(self, s, field, old_value):
+        if field in ("coursework", "exam"):
+            self.update(s)
+
+    def mark_counts(self):
+        #overall mark -> number of students, one bincount over the column with numpy
+        if self._numpy:
+            overall = self._overall[:self._size][self._live[:self._size]]
+            if not len(overall):
+                return {}
+            lowest = int(overall.min())  #bad data can go below 0, so count from the lowest mark
+            counts = np.bincount(overall - lowest)
+            marks = np.flatnonzero(counts)
+            return dict(zip((int(m) + lowest for m in marks), (int(counts[m]) for m in marks)))
+        counts = {}
+        for alive, overall in zip(self._live, self._overall):
+            if alive:
+                counts[overall] = counts.get(overall, 0) + 1
+        return counts
+
+    def percentiles(self, quantiles=(25, 50, 75)):
+        #{quantile: percentage} over the live students, or None when there are none.
+        #Kept until the next change, so refreshing the view doesn't sort the cohort again.
+        if not self._rows:
+            return None
+        result = self._percentiles.get(quantiles)
+        if result is None:
+            if self._numpy:
+                percent = self._percent[:self._size][self._live[:self._size]]
+                result = dict(zip(quantiles, (float(q) for q in np.percentile(percent, quantiles))))
+            else:
+                live_percent = sorted(p for alive, p in zip(self._live, self._percent) if alive)
+                result = {q: percentile(live_percent, q) for q in quantiles}
+            self._percentiles[quantiles] = result
+        return result
+
+
+# Cohort statistics section:
+
+class CohortStats:
+    #Running totals that are kept up to date from the StudentStore events, so the
+    #count, average and grade counts are O(1) to read. Highest and lowest come from the
+    #students filed by overall mark: there are only ever a few hundred different marks,
+    #so the top and bottom are found from the marks alone, without a heap entry per student.
+
+    def __init__(self, students=None, check=False):
+        self.students = students  #store to recount from when checking
+        self.check = check        #verify against a full recount after every change
+        self.count = 0
+        self.total_overall = 0
+        self.grades = dict.fromkeys(GRADES, 0)
+        #overall mark -> {Student: None} in the order they were counted, so the
+        #earliest student wins a tie, like max()/min()
+        self._by_mark = {}
+
+    def _count(self, s, overall):
+        self.count += 1
+        self.total_overall += overall
+        self.grades[DEFAULT_POLICY.grade(overall)] += 1
+        same_mark = self._by_mark.get(overall)
+        if same_mark is None:
+            self._by_mark[overall] = {s: None}
+        else:
+            same_mark[s] = None
+
+    def _uncount(self, s, overall):
+        self.count -= 1
+        self.total_overall -= overall
+        self.grades[DEFAULT_POLICY.grade(overall)] -= 1
+        same_mark = self._by_mark[overall]
+        del same_mark[s]
+        if not same_mark:
+            del self._by_mark[overall]
+
+    #StudentStore events
+    def student_added(self, s):
+        self._count(s, s.overall)
+        self._verify()
+
+    def students_added(self, students):
+        #count a whole batch with a few passes over the marks
+        overall = [s.coursework + s.exam for s in students]
+        self.count += len(students)
+        self.total_overall += sum(overall)
+        by_mark = self._by_mark
+        for s, mark in zip(students, overall):
+            same_mark = by_mark.get(mark)
+            if same_mark is None:
+                by_mark[mark] = {s: None}
+            else:
+                same_mark[s] = None
+        for grade, n in DEFAULT_POLICY.grade_counts(overall).items():
+            self.grades[grade] += n
+        self._verify()
+
+    def student_removed(self, s):
+        self._uncount(s, s.overall)
+        self._verify()
+
+    def student_changed(self, s, field, old_value):
+        #the other mark hasn't changed, so the old overall comes from the old value
+        if field == "coursework":
+            self._uncount(s, old_value + s.exam)
+            self._count(s, s.overall)
+        elif field == "exam":
+            self._uncount(s, s.coursework + old_value)
+            self._count(s, s.overall)
+        self._verify()
+
+    #the figures
+    def average(self):
+        #average percentage, or None without students
+        if not self.count:
+            return None
+        return (self.total_overall / self.count / MAX_MARKS) * 100
+
+    def highest(self):
+        if not self._by_mark:
+            return None
+        return next(iter(self._by_mark[max(self._by_mark)]))
+
+    def lowest(self):
+        if not self._by_mark:
+            return None
+        return next(iter(self._by_mark[min(self._by_mark)]))
+
+    def _verify(self):
+        if self.check:
+            self.verify()
+
+    def verify(self):
+        #Recount everything from the store and raise AssertionError if anything differs
+        students = list(self.students)
+        grades = dict.fromkeys(GRADES, 0)
+        for s in students:
+            grades[s.grade] += 1
+        assert self.count == len(students), (self.count, len(students))
+        assert self.total_overall == sum(s.overall for s in students)
+        assert self.grades == grades, (self.grades, grades)
+        if students:
+            assert self.highest().overall == max(s.overall for s in students)
+            assert self.lowest().overall == min(s.overall for s in students)
+        else:
+            assert self.highest() is None and self.lowest() is None
+
+
+# Sorted views section:
+
+def id_sort_key(s):
+    #numeric ids sort as numbers, anything else after them as text
+    return (0, int(s.id), "") if s.id.isdigit() else (1, 0, s.id)
+
+
+#the orders the records can be displayed in
+SORT_KEYS = {
+    "name": lambda s: s.name.casefold(),
+    "id": id_sort_key,
+    "overall": lambda s: s.overall,
+    "exam": lambda s: s.exam,
+    "grade": lambda s: s.grade,
+}
+
+
+class SortedView:
+    #One display order of the store (e.g. by overall mark) kept sorted as students
+    #are added, changed and removed, using bisect on a list of (key, tie breaker, Student).
+    #Switching to a view or flipping its direction never sorts anything.
+
+    def __init__(self, students, key_name):
+        self.key_name = key_name
+        self.key = SORT_KEYS[key_name]
+        self._seq = {}   #Student -> tie breaker (keeps equal keys in the order they arrived)
+        self._keys = {}  #Student -> key it was filed under
+        self._entries = []
+        for s in students:
+            self._seq[s] = len(self._seq)
+            self._keys[s] = self.key(s)
+        self._entries = sorted((self._keys[s], self._seq[s], s) for s in self._seq)
+        self._next_seq = len(self._seq)
+
+    def __iter__(self):
+        return (entry[2] for entry in self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _insert(self, s):
+        key = self._keys[s] = self.key(s)
+        bisect.insort(self._entries, (key, self._seq[s], s))
+
+    def _remove(self, s):
+        entry = (self._keys.pop(s), self._seq[s], s)
+        del self._entries[bisect.bisect_left(self._entries, entry)]
+
+    def page(self, start, count):
+        return [entry[2] for entry in self._entries[start:start + count]]
+
+    def descending(self):
+        return DescendingView(self)
+
+    #StudentStore events
+    def student_added(self, s):
+        self._seq[s] = self._next_seq
+        self._next_seq += 1
+        self._insert(s)
+
+    def students_added(self, students):
+        #file the batch, then one sort (timsort merges the already sorted run)
+        for s in students:
+            self._seq[s] = self._next_seq
+            self._next_seq += 1
+            self._keys[s] = self.key(s)
+            self._entries.append((self._keys[s], self._seq[s], s))
+        self._entries.sort()
+
+    def student_removed(self, s):
+        self._remove(s)
+        del self._seq[s]
+
+    def student_changed(self, s, field, old_value):
+        if self.key(s) != self._keys[s]:
+            self._remove(s)
+            self._insert(s)
+
+
+class DescendingView:
+    #A SortedView read from the other end
+    def __init__(self, view):
+        self.view = view
+
+    def __iter__(self):
+        return (entry[2] for entry in reversed(self.view._entries))
+
+    def __len__(self):
+        return len(self.view)
+
+    def page(self, start, count):
+        end = len(self.view) - start
+        rows = self.view.page(max(0, end - count), end - max(0, end - count))
+        rows.reverse()
+        return rows
+
+
+# Search index section:
+
+class SearchIndex:
+    #Type-ahead search over names and ids. Prefix matches come from two sorted lists
+    #(found with bisect), and matches in the middle of a name come from a trigram
+    #index (every 3 letter piece of a name -> the students whose name contains it).
+    #Kept up to date from the StudentStore events like the other listeners.
+
+    def __init__(self, students):
+        self._seq = {}    #Student -> tie breaker so list entries never compare Students
+        self._names = []  #(case-folded name, tie breaker, Student), sorted
+        self._ids = []    #(id, tie breaker, Student), sorted
+        self._grams = {}  #trigram -> {Student: None}
+        for s in students:
+            self._seq[s] = len(self._seq)
+            self._names.append((s.name.casefold(), self._seq[s], s))
+            self._ids.append((s.id, self._seq[s], s))
+            self._add_grams(s, s.name)
+        self._names.sort()
+        self._ids.sort()
+        self._next_seq = len(self._seq)
+
+    @staticmethod
+    def trigrams(text):
+        text = text.casefold()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _add_grams(self, s, name):
+        for gram in self.trigrams(name):
+            self._grams.setdefault(gram, {})[s] = None
+
+    def _remove_grams(self, s, name):
+        for gram in self.trigrams(name):
+            same_gram = self._grams[gram]
+            del same_gram[s]
+            if not same_gram:
+                del self._grams[gram]
+
+    def _remove_entry(self, entries, entry):
+        del entries[bisect.bisect_left(entries, entry)]
+
+    def search(self, query, limit=20):
+        #Up to limit students: names starting with the query, then ids starting
+        #with it, then names containing it. An empty query gives the first names.
+        results = {}
+        text = query.strip()
+        folded = text.casefold()
+        for entries, prefix in ((self._names, folded), (self._ids, text)):
+            i = bisect.bisect_left(entries, (prefix,))
+            while i < len(entries) and len(results) < limit and entries[i][0].startswith(prefix):
+                results[entries[i][2]] = None
+                i += 1
+
+        if len(folded) >= 3 and len(results) < limit:
+            #students that have every trigram of the query, smallest set first
+            grams = sorted((self._grams.get(g, {}) for g in self.trigrams(folded)), key=len)
+            candidates = (s for s in grams[0]
+                          if s not in results and all(s in g for g in grams[1:])
+                          and folded in s.name.casefold())
+            for s in heapq.nsmallest(limit - len(results), candidates,
+                                     key=lambda s: (s.name.casefold(), self._seq[s])):
+                results[s] = None
+        return list(results)
+
+    #StudentStore events
+    def student_added(self, s):
+        self._seq[s] = self._next_seq
+        self._next_seq += 1
+        bisect.insort(self._names, (s.name.casefold(), self._seq[s], s))
+        bisect.insort(self._ids, (s.id, self._seq[s], s))
+        self._add_grams(s, s.name)
+
+    def students_added(self, students):
+        for s in students:
+            self._seq[s] = self._next_seq
+            self._next_seq += 1
+            self._names.append((s.name.casefold(), self._seq[s], s))
+            self._ids.append((s.id, self._seq[s], s))
+            self._add_grams(s, s.name)
+        self._names.sort()
+        self._ids.sort()
+
+    def student_removed(self, s):
+        self._remove_entry(self._names, (s.name.casefold(), self._seq[s], s))
+        self._remove_entry(self._ids, (s.id, self._seq[s], s))
+        self._remove_grams(s, s.name)
+        del self._seq[s]
+
+    def student_changed(self, s, field, old_value):
+        if field == "name":
+            self._remove_entry(self._names, (old_value.casefold(), self._seq[s], s))
+            bisect.insort(self._names, (s.name.casefold(), self._seq[s], s))
+            self._remove_grams(s, old_value)
+            self._add_grams(s, s.name)
+        elif field == "id":
+            self._remove_entry(self._ids, (old_value, self._seq[s], s))
+            bisect.insort(self._ids, (s.id, self._seq[s], s))
+
+
+# Student store section:
+
+class StudentStore:
+    #Holds every Student together with an id index and a case-folded name index,
+    #so finding, updating and deleting a student never has to scan the whole cohort.
+    #The display order is kept in an insertion-ordered dict so deletes are O(1) as well.
+    #Anything in listeners is told about every change through student_added(s),
+    #student_removed(s) and student_changed(s, field, old value).
+    #Changes hold lock so a background save can copy the rows without seeing half a change.
+
+    #fields that can be changed through update()
+    FIELDS = ("coursework", "exam", "name", "id")
+
+    def __init__(self, students=()):
+        self._order = {}    #Student -> None, in display order
+        self._by_id = {}    #id -> Student
+        self._by_name = {}  #case-folded name -> Student, or a list of them when names repeat
+        self._rows = None   #list copy of the display order, made when a page is needed
+        self.lock = threading.RLock()
+        self.columns = StudentColumns()  #marks arrays for the percentiles
+        self.stats = CohortStats(self, check=STATS_CHECK)  #running count, average, grades, highest/lowest
+        self.listeners = [self.columns, self.stats]
+        self.views = {}  #sort key name -> SortedView, made the first time they're asked for
+        self._search = None  #SearchIndex, also made the first time it's needed
+        for s in students:
+            self.add(s)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def _notify(self, event, *args):
+        for listener in self.listeners:
+            getattr(listener, event)(*args)
+
+    def _index_name(self, s):
+        #most names are unique, so the Student is stored on its own and only a shared
+        #name gets a list (a container per name would outweigh the students themselves)
+        key = s.name.casefold()
+        same_name = self._by_name.get(key)
+        if same_name is None:
+            self._by_name[key] = s
+        elif type(same_name) is list:
+            same_name.append(s)
+        else:
+            self._by_name[key] = [same_name, s]
+
+    def _unindex_name(self, s):
+        key = s.name.casefold()
+        same_name = self._by_name[key]
+        if type(same_name) is not list:
+            del self._by_name[key]
+            return
+        same_name.remove(s)
+        if len(same_name) == 1:
+            self._by_name[key] = same_name[0]
+
+    @staticmethod
+    def check_text(field, value):
+        #Ids and names typed in end up in comma separated lines (the marks file and its
+        #journal), where a comma would split them in two and the line wouldn't load.
+        #Raises ValueError for a value that can't be written.
+        if "," in value or "\n" in value:
+            raise ValueError(f"The student {field} can't contain a comma or a line break.")
+
+    def add(self, s):
+        #Raises ValueError if a student with the same id is already stored
+        if s.id in self._by_id:
+            raise ValueError(f"Student ID '{s.id}' already exists.")
+        with self.lock:
+            self._order[s] = None
+            self._rows = None
+            self._by_id[s.id] = s
+            self._index_name(s)
+            self._notify("student_added", s)
+
+    def add_many(self, students):
+        #Add a list of students whose ids are new and different from each other (the caller
+        #checks). Listeners with a students_added(list) method get the whole batch in one
+        #call so they can rebuild once; the rest are told about each student as usual.
+        with self.lock:
+            self._order.update(dict.fromkeys(students))
+            self._by_id.update(zip([s.id for s in students], students))
+            for s in students:
+                self._index_name(s)
+            self._rows = None
+            for listener in self.listeners:
+                added = getattr(listener, "students_added", None)
+                if added is not None:
+                    added(students)
+                else:
+                    for s in students:
+                        listener.student_added(s)
+
+    def get(self, sid):
+        #the student with this id, or None
+        return self._by_id.get(sid)
+
+    def find(self, key):
+        #every student whose id or name (any case) matches key, id match first
+        same_name = self._by_name.get(key.casefold())
+        if same_name is None:
+            matches = []
+        elif type(same_name) is list:
+            matches = list(same_name)
+        else:
+            matches = [same_name]
+        by_id = self._by_id.get(key)
+        if by_id is not None and by_id not in matches:
+            matches.insert(0, by_id)
+        return matches
+
+    def page(self, start, count):
+        #the students in display positions start .. start + count - 1
+        if self._rows is None:
+            self._rows = list(self._order)
+        return self._rows[start:start + count]
+
+    def remove(self, s):
+        with self.lock:
+            del self._order[s]
+            self._rows = None
+            del self._by_id[s.id]
+            self._unindex_name(s)
+            self._notify("student_removed", s)
+
+    def rows(self):
+        #(id, name, coursework, exam) for every student, copied under the lock for saving
+        with self.lock:
+            return [(s.id, s.name, s.coursework, s.exam) for s in self._order]
+
+    def remove_matching(self, key):
+        #delete every student matching the name or id, returns the removed students
+        removed = self.find(key)
+        for s in removed:
+            self.remove(s)
+        return removed
+
+    def update(self, s, field, value):
+        #Change one field of a stored student and keep the indexes in step.
+        #Raises ValueError for an unknown field, a non-numeric mark, a taken id
+        #or an id or name with a comma in it.
+        with self.lock:
+            self._update(s, field, value)
+
+    def _update(self, s, field, value):
+        old_value = getattr(s, field, None)
+        if field in ("coursework", "exam"):
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError("Please enter a valid numeric value for coursework/exam.")
+            setattr(s, field, value)
+        elif field == "name":
+            self.check_text("name", value)
+            self._unindex_name(s)
+            s.name = value
+            self._index_name(s)
+        elif field == "id":
+            self.check_text("ID", value)
+            if value != s.id and value in self._by_id:
+                raise ValueError(f"Student ID '{value}' already exists.")
+            del self._by_id[s.id]
+            s.id = value
+            self._by_id[value] = s
+        else:
+            raise ValueError("Invalid field selected.")
+        self._notify("student_changed", s, field, old_value)
+
+    def sorted_view(self, key_name, reverse=False):
+        #a display order that keeps itself sorted (see SortedView)
+        view = self.views.get(key_name)
+        if view is None:
+            view = self.views[key_name] = SortedView(self, key_name)
+            self.listeners.append(view)
+        return view.descending() if reverse else view
+
+    def search_index(self):
+        if self._search is None:
+            self._search = SearchIndex(self)
+            self.listeners.append(self._search)
+        return self._search
+
+
+def percentile(sorted_values, q):
+    #linear interpolation between the closest ranks (same as numpy's default)
+    pos = (len(sorted_values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+#set by the window to show messages itself (as message boxes), until then they are printed
+message_handler = None
+
+
+def show_message(kind, title, text):
+    #tell the user something (kind = "info", "warning" or "error")
+    if message_handler is None:
+        print(f"{title}: {text}", file=sys.stderr)
+    else:
+        message_handler(kind, title, text)
+
+
+# Loading and saving data
+def parse_student_line(line):
+    #Turn one CSV line (id, name, coursework 1-3, exam) into a Student.
+    #Raises ValueError with a readable message if the line is malformed.
+    parts = line.split(",")
+    if len(parts) != 6:
+        raise ValueError(f"expected 6 fields, found {len(parts)}")
+    sid, name, c1, c2, c3, exam = parts
+    sid, name = sid.strip(), name.strip()
+    if not sid or not name:
+        raise ValueError("missing id or name")
+    c1, c2, c3, exam = map(int, (c1, c2, c3, exam))
+    return Student(sid, name, c1 + c2 + c3, exam)
+
+
+def iter_student_rows(f, errors=None):
+    #Generator that reads the marks file one line at a time and yields (line number, Student).
+    #Only the current line is ever held in memory, so a huge file is never copied.
+    #Bad lines are skipped and recorded in errors as (line number, message, line).
+    first = True
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue  #ignore empty lines
+
+        if first:
+            first = False
+            #The first line is expected to contain the number of students (not strictly needed)
+            if "," not in line:
+                if not line.isdigit() and errors is not None:
+                    errors.append((line_no, "invalid student count", line))
+                continue
+
+        try:
+            yield line_no, parse_student_line(line)
+        except ValueError as e:
+            if errors is not None:
+                errors.append((line_no, str(e), line))
+
+
+def load_data(path=None, progress=None):
+    #progress, if given, is called now and then with the fraction of the file read so far
+    path = path or FILE_PATH
+    errors = []  #malformed lines found while loading
+
+    students = StudentStore()
+
+    #The rows are added LOAD_CHUNK at a time with add_many(), so the running figures,
+    #views and columns are extended once per chunk instead of once per student, and only
+    #one chunk of parsed rows is held on top of the store. The cycle collector is paused
+    #like in ingest_files(): the load makes no cycles, only a great many objects.
+    chunk = {}  #id -> Student, rows parsed since the last add_many()
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        #Open the data file in read mode and stream the records into the store
+        with open(path, 'r') as f:
+            size = max(os.fstat(f.fileno()).st_size, 1)
+            for line_no, s in iter_student_rows(f, errors):
+                if s.id in chunk or students.get(s.id) is not None:
+                    errors.append((line_no, f"Student ID '{s.id}' already exists.", s.name))
+                else:
+                    chunk[s.id] = s
+                    if len(chunk) >= LOAD_CHUNK:
+                        students.add_many(list(chunk.values()))
+                        chunk.clear()
+                if progress is not None and line_no % 20000 == 0:
+                    progress(min(f.buffer.tell() / size, 1.0))
+        students.add_many(list(chunk.values()))
+    except FileNotFoundError:
+        #If the file doesn't exist, show an error message to the user
+        show_message("error", "Error", "File not found")
+        return students  #Return an empty store in case of error
+    finally:
+        if collecting:
+            gc.enable()
+
+    #Report any malformed lines with their line numbers instead of aborting the load
+    for line_no, message, line in errors:
+        print(f"Skipped line {line_no} of '{path}': {message} ({line!r})", file=sys.stderr)
+    if errors:
+        show_message(
+            "warning", "Warning", f"{len(errors)} malformed line(s) in '{path}' were skipped."
+        )
+
+    #Print a message confirming the file loaded successfully
+    print(f"Loaded '{path}' successfully.", file=sys.stderr)
+    return students  #Return the store of Student records
+
+
+def split_coursework(total):
+    #split coursework back into 3 parts that still add up to the total
+    c_each = total // 3
+    return total - 2 * c_each, c_each, c_each
+
+
+def write_rows(path, rows):
+    #Write (id, name, coursework, exam) rows in the marks file layout and fsync them
+    rows = list(rows)
+    with open(path, "w") as f:
+        f.write(str(len(rows)) + "\n")  #first line = student count
+        for sid, name, coursework, exam in rows:
+            c1, c2, c3 = split_coursework(coursework)
+            f.write(f"{sid},{name},{c1},{c2},{c3},{exam}\n")  # each student on new line
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot(path, rows):
+    #The rows go to a temp file first which is then renamed over the real file,
+    #so a crash part way through never leaves a half written marks file behind.
+    tmp_path = path + ".tmp"
+    write_rows(tmp_path, rows)
+    os.replace(tmp_path, path)
+
+
+# File watching section:
+
+class FileWatcher:
+    #Notices when another program (like the nightly import) changes the marks file by
+    #comparing its inode, size and modification time with what they were when we last
+    #read or wrote it - an os.stat that's cheap enough to run every couple of seconds.
+    #It also remembers where the rows we've read end, so rows appended after that can
+    #be read on their own instead of parsing the whole file again.
+
+    TAIL = 64  #bytes before the end of what we've read that must be unchanged for the file to count as appended to
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0   #goes up every time the file is read or written, so a snapshot can tell a sync happened
+        self._stat = None  #(inode, size, mtime) when we last read or wrote the file, None if it didn't exist
+        self._offset = 0   #end of the last complete line we've read
+        self._tail = b""   #the TAIL bytes just before _offset
+
+    def remember(self):
+        #the file holds exactly what we know about (we're about to load it, or just wrote it)
+        self.version += 1
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                start = max(st.st_size - self.TAIL, 0)
+                f.seek(start)
+                chunk = f.read(st.st_size - start)
+        except FileNotFoundError:
+            self._stat, self._offset, self._tail = None, 0, b""
+            return
+        cut = chunk.rfind(b"\n") + 1
+        if cut == 0 or chunk.endswith(b"\n"):
+            cut = len(chunk)  #ends with a whole line (or a line too long to check, count it as whole)
+        self._offset = start + cut
+        self._tail = chunk[:cut]
+        self._stat = (st.st_ino, start + len(chunk), st.st_mtime_ns)
+
+    def check(self):
+        #"same", "appended", "rewritten" (replaced, truncated or edited) or "missing"
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return "same" if self._stat is None else "missing"
+        if self._stat is None:
+            return "rewritten"  #it didn't exist when we last looked
+        inode, size, mtime = self._stat
+        if (st.st_ino, st.st_size, st.st_mtime_ns) == self._stat:
+            return "same"
+        if st.st_ino != inode or st.st_size <= size:
+            return "rewritten"  #a new file renamed over ours, or changed without growing
+        with open(self.path, "rb") as f:
+            f.seek(self._offset - len(self._tail))
+            if f.read(len(self._tail)) != self._tail:
+                return "rewritten"  #the rows we read have changed underneath us
+        return "appended"
+
+    def read_appended(self, errors):
+        #Parse the whole lines added since we last looked. A half written last line is
+        #left for next time. Bad lines go in errors as (appended line number, message, line).
+        self.version += 1
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+            st = os.fstat(f.fileno())
+        start = self._offset
+        cut = data.rfind(b"\n") + 1
+        self._offset = start + cut
+        self._tail = (self._tail + data[:cut])[-self.TAIL:]
+        self._stat = (st.st_ino, start + len(data), st.st_mtime_ns)
+
+        rows = []
+        for line_no, line in enumerate(data[:cut].decode("utf-8", "replace").splitlines(), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(parse_student_line(line))
+            except ValueError as e:
+                errors.append((line_no, str(e), line))
+        return rows
+
+    def read_all(self, errors):
+        #Parse the whole file again after it was rewritten. It's remembered first, so rows
+        #appended while we read are picked up (again) by the next read_appended.
+        self.remember()
+        try:
+            with open(self.path, "r") as f:
+                return [s for line_no, s in iter_student_rows(f, errors)]
+        except FileNotFoundError:
+            return []
+
+
+class LocalChanges:
+    #StudentStore listener that remembers which students this program has changed since
+    #the marks file was last written, and what they were before the first change. That's
+    #what tells an edit made here apart from one made by another program when they meet.
+
+    def __init__(self):
+        self.changed = {}  #id -> (change number, (name, coursework, exam) before, None if it was new)
+        self.count = 0     #change number of the latest change
+        self.paused = False  #set while merging in changes from the file, which aren't ours
+
+    def _mark(self, sid, before):
+        if self.paused:
+            return
+        self.count += 1
+        first = self.changed.get(sid)
+        self.changed[sid] = (self.count, before if first is None else first[1])
+
+    def clear(self, upto):
+        #The marks file now holds every change up to and including number upto.
+        #Call with the store's lock held, changes are marked under it.
+        self.changed = {sid: change for sid, change in self.changed.items() if change[0] > upto}
+
+    #StudentStore events
+    def student_added(self, s):
+        self._mark(s.id, None)
+
+    def student_removed(self, s):
+        self._mark(s.id, (s.name, s.coursework, s.exam))
+
+    def student_changed(self, s, field, old_value):
+        if field == "id":
+            self._mark(old_value, (s.name, s.coursework, s.exam))
+            self._mark(s.id, None)
+            return
+        before = {"name": s.name, "coursework": s.coursework, "exam": s.exam}
+        before[field] = old_value
+        self._mark(s.id, (before["name"], before["coursework"], before["exam"]))
+
+
+# Storage section:
+
+class TextFileStorage:
+    #Keeps the marks file up to date by rewriting all of it after every change.
+    #Each change method is told what happened so smarter storages can save less.
+    #The file is never written over if another program has changed it since we last
+    #read it; sync() merges those changes in first (see FileWatcher and LocalChanges).
+
+    def __init__(self, path):
+        self.path = path
+        self.conflicts_path = path + ".conflicts"  #the other program's side of each conflict
+        self.students = None
+        self.watcher = FileWatcher(path)
+        self.local_changes = LocalChanges()
+        self._sync_lock = threading.Lock()  #a sync and the check-then-rename of a snapshot never overlap
+
+    def load(self, progress=None):
+        self.watcher.remember()
+        self.students = load_data(self.path, progress)
+        self.students.listeners.append(self.local_changes)
+        return self.students
+
+    def save(self):
+        #Raises OSError if the file changed again between the merge and the write
+        self.sync()
+        if not self._snapshot():
+            raise OSError(f"'{self.path}' was changed by another program while saving, please try again")
+
+    def _snapshot(self):
+        #copy the rows, and note which changes and which version of the file they go with
+        with self.students.lock:
+            rows = self.students.rows()
+            upto = self.local_changes.count
+            version = self.watcher.version
+        return self._replace(rows, upto, version)
+
+    def _replace(self, rows, upto, version):
+        #Write the rows over the marks file unless it changed since they were copied.
+        #Returns False (and leaves the file alone) if it did.
+        tmp_path = self.path + ".tmp"
+        write_rows(tmp_path, rows)
+        with self._sync_lock:
+            if self.watcher.version != version or self.watcher.check() not in ("same", "missing"):
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, self.path)
+            self.watcher.remember()
+            #the compactor thread gets here too, while the window keeps marking changes
+            #(under the store's lock), so clear them under that lock as well
+            with self.students.lock:
+                self.local_changes.clear(upto)
+        return True
+
+    def sync(self):
+        #Merge in rows another program appended to the marks file, or the whole file again
+        #if it was rewritten, since we last read or wrote it. Must run on the thread that
+        #changes the store. Returns None if the file hasn't changed, otherwise a dict with
+        #how many students were added/updated/removed, the conflicts and any bad lines.
+        if self.students is None:
+            return None
+        with self._sync_lock:
+            state = self.watcher.check()
+            if state in ("same", "missing"):
+                return None  #a missing file is simply written again on the next save
+            errors = []
+            if state == "appended":
+                rows = self.watcher.read_appended(errors)
+            else:
+                rows = self.watcher.read_all(errors)
+            report = self._merge(rows, state == "rewritten")
+        report["errors"] = errors
+        if report["conflicts"]:
+            self._keep_conflicts(report["conflicts"])
+        for sid, mine, theirs in report["conflicts"]:
+            print(f"Conflict on student '{sid}' in '{self.path}': kept {mine}, "
+                  f"the file's {theirs} was added to '{self.conflicts_path}'", file=sys.stderr)
+        return report
+
+    def _keep_conflicts(self, conflicts):
+        #Append the file's side of each conflict to <marks file>.conflicts as CSV, so the
+        #other program's edit can still be looked at after ours is saved over it.
+        #A student deleted by the other program is written with "deleted".
+        when = time.strftime("%Y-%m-%d %H:%M:%S")
+        new_file = not os.path.exists(self.conflicts_path)
+        with open(self.conflicts_path, "a", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            if new_file:
+                writer.writerow(["time", "id", "name", "coursework", "exam", "change"])
+            for sid, mine, theirs in conflicts:
+                if theirs is None:
+                    writer.writerow([when, sid, "", "", "", "deleted"])
+                else:
+                    writer.writerow([when, sid, *theirs, "changed"])
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _merge(self, rows, rewritten):
+        #A student changed here and in the file is a conflict: our version is kept (it is
+        #still waiting to be saved) and the file's is reported, and written to the
+        #conflicts file by sync() so it isn't lost. A student only changed in
+        #the file is taken from the file, and after a rewrite anyone missing from the file
+        #that we haven't touched was deleted there.
+        report = {"rewritten": rewritten, "added": 0, "updated": 0, "removed": 0, "conflicts": []}
+        changed = self.local_changes.changed
+        seen = set()
+        self.local_changes.paused = True
+        try:
+            for theirs in rows:
+                if theirs.id in seen:
+                    continue  #the first row with an id wins, like load_data
+                seen.add(theirs.id)
+                mine = self.students.get(theirs.id)
+                their_values = (theirs.name, theirs.coursework, theirs.exam)
+                my_values = None if mine is None else (mine.name, mine.coursework, mine.exam)
+                if my_values == their_values:
+                    continue
+                if theirs.id in changed:
+                    if their_values != changed[theirs.id][1]:
+                        report["conflicts"].append((theirs.id, my_values, their_values))
+                    continue
+                if mine is None:
+                    self.students.add(theirs)
+                    report["added"] += 1
+                else:
+                    for field, value in zip(("name", "coursework", "exam"), their_values):
+                        if getattr(mine, field) != value:
+                            self.students.update(mine, field, value)
+                    report["updated"] += 1
+            if rewritten:
+                for mine in list(self.students):
+                    if mine.id in seen:
+                        continue
+                    if mine.id not in changed:
+                        self.students.remove(mine)
+                        report["removed"] += 1
+                    elif changed[mine.id][1] is not None:
+                        #deleted there, changed here
+                        report["conflicts"].append((mine.id, (mine.name, mine.coursework, mine.exam), None))
+        finally:
+            self.local_changes.paused = False
+        return report
+
+    def check(self, field, value):
+        #Raises ValueError if value can't be saved as a student's field (id, name,
+        #coursework or exam). Called before the store is changed, so a value the file
+        #can't hold is turned away up front instead of failing later in the saver.
+        if field in ("id", "name"):
+            StudentStore.check_text("ID" if field == "id" else field, value)
+
+    def put(self, s):
+        #a student was added or had their name/marks changed
+        self.save()
+
+    def delete(self, sid):
+        self.save()
+
+    def rename(self, old_id, new_id):
+        self.save()
+
+    def apply(self, changes):
+        #Save a batch of (method name, args) changes that built up while the last save ran.
+        #Rewriting the file once covers all of them.
+        if changes:
+            self.save()
+
+    def ordered(self, key_name=None, reverse=False):
+        #the records in file order or in one of the SORT_KEYS orders
+        if self.students is None:
+            self.load()
+        if key_name is None:
+            return self.students
+        return self.students.sorted_view(key_name, reverse)
+
+    def summary_lines(self):
+        if self.students is None:
+            self.load()
+        return summary_lines(self.students)
+
+    def mark_counts(self):
+        #overall mark -> number of students. Without a loaded store the file is streamed
+        #into the counts instead, so only the ids are kept (a repeated id is skipped, as
+        #loading does) and none of the indexes, figures and columns of a full load are built.
+        if self.students is not None:
+            return self.students.columns.mark_counts()
+        counts = {}
+        seen = set()
+        errors = []
+        try:
+            with open(self.path, "r") as f:
+                for line_no, s in iter_student_rows(f, errors):
+                    if s.id in seen:
+                        errors.append((line_no, f"Student ID '{s.id}' already exists.", s.name))
+                        continue
+                    seen.add(s.id)
+                    overall = s.coursework + s.exam
+                    counts[overall] = counts.get(overall, 0) + 1
+        except FileNotFoundError:
+            show_message("error", "Error", "File not found")
+        report_errors(self.path, errors)
+        return counts
+
+    def preview(self, count):
+        #The first count students, read without loading the rest of the file, so the
+        #window has something to show while the full load runs. Journal changes aren't included.
+        page = StudentStore()
+        try:
+            with open(self.path, "r") as f:
+                for line_no, s in iter_student_rows(f):
+                    if len(page) >= count:
+                        break
+                    if page.get(s.id) is None:
+                        page.add(s)
+        except FileNotFoundError:
+            pass
+        return page
+
+    def close(self):
+        pass
+
+
+class JournalStorage(TextFileStorage):
+    #Write-ahead journal: every change appends one short line to <marks file>.journal
+    #instead of rewriting the marks file. Once enough changes have built up, a
+    #background thread folds them into a new snapshot of the marks file.
+    #Journal lines (every one can safely be replayed twice):
+    #   P,id,name,coursework,exam   add or replace a student
+    #   D,id                        delete a student
+    #   I,old id,new id             change a student's id
+
+    COMPACT_EVERY = 500  #journal lines before the snapshot is rewritten
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.journal_path = path + ".journal"
+        self.old_journal_path = path + ".journal.old"  #journal being folded into the snapshot
+        self._journal = None
+        self._pending = 0  #lines in the current journal
+        self._compactor = None
+        self._group = None  #lines collected by apply() to be written with one fsync
+
+    def load(self, progress=None):
+        #Recovery: read the last snapshot then replay any journal written after it
+        super().load(progress)
+        replayed = 0
+        for journal_path in (self.old_journal_path, self.journal_path):
+            replayed += self._replay(journal_path)
+        if replayed:
+            print(f"Replayed {replayed} journal change(s) over '{self.path}'.", file=sys.stderr)
+
+        self._journal = open(self.journal_path, "a")
+        if replayed:
+            self.compact()  #fold the recovered changes into a fresh snapshot
+        return self.students
+
+    def _replay(self, journal_path):
+        try:
+            f = open(journal_path, "r")
+        except FileNotFoundError:
+            return 0
+        count = 0
+        with f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                try:
+                    self._apply(line.split(","))
+                    count += 1
+                except (ValueError, KeyError) as e:
+                    #a torn last line from a crash, or a change that no longer applies
+                    print(f"Skipped journal line {line_no} of '{journal_path}': {e!r}", file=sys.stderr)
+        return count
+
+    def _apply(self, fields):
+        kind = fields[0]
+        if kind == "P":
+            sid, name, coursework, exam = fields[1:]
+            s = self.students.get(sid)
+            if s is None:
+                self.students.add(Student(sid, name, int(coursework), int(exam)))
+            else:
+                self.students.update(s, "name", name)
+                self.students.update(s, "coursework", coursework)
+                self.students.update(s, "exam", exam)
+        elif kind == "D":
+            s = self.students.get(fields[1])
+            if s is not None:
+                self.students.remove(s)
+        elif kind == "I":
+            old_id, new_id = fields[1:]
+            s = self.students.get(old_id)
+            if s is not None:
+                self.students.update(s, "id", new_id)
+        else:
+            raise ValueError(f"unknown journal entry {kind!r}")
+
+    def _append(self, *fields):
+        line = ",".join(str(field) for field in fields) + "\n"
+        if self._group is not None:
+            self._group.append(line)  #written by apply() with the rest of the batch
+            return
+        self._write([line])
+
+    def _write(self, lines):
+        self._journal.write("".join(lines))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())  #the changes are on disk before we carry on
+        self._pending += len(lines)
+        if self._pending >= self.COMPACT_EVERY:
+            self.compact()
+
+    def apply(self, changes):
+        #group commit: every change in the batch is appended with a single fsync
+        self._group = []
+        try:
+            for name, args in changes:
+                getattr(self, name)(*args)
+            lines = self._group
+        finally:
+            self._group = None
+        if lines:
+            self._write(lines)
+
+    def put(self, s):
+        self._append("P", s.id, s.name, s.coursework, s.exam)
+
+    def delete(self, sid):
+        self._append("D", sid)
+
+    def rename(self, old_id, new_id):
+        self._append("I", old_id, new_id)
+
+    def save(self):
+        #Merge in any changes from other programs, fold everything into the snapshot now
+        #and wait for it. Raises OSError if the file keeps changing under us.
+        if self._compactor is not None:
+            self._compactor.join()
+        for attempt in range(3):
+            self.sync()
+            self.compact()
+            self._compactor.join()
+            if not os.path.exists(self.old_journal_path):
+                return
+        raise OSError(f"'{self.path}' keeps being changed by another program, "
+                      f"the changes are still safe in '{self.old_journal_path}'")
+
+    def compact(self):
+        #Start folding the journal into a new snapshot on a background thread
+        if self._compactor is not None and self._compactor.is_alive():
+            return  #still busy with the last one, the journal just keeps growing
+        if os.path.exists(self.old_journal_path):
+            #a previous compaction didn't finish - its changes are already in memory,
+            #so add them to the front of the current journal before moving it aside
+            self._journal.close()
+            with open(self.old_journal_path, "r") as old, open(self.journal_path, "r") as new:
+                merged = old.read() + new.read()
+            with open(self.journal_path, "w") as f:
+                f.write(merged)
+
+        #move the current journal aside and start a new one - changes made while the
+        #snapshot is written go to the new journal, so nothing is lost if we crash
+        self._journal.close()
+        os.replace(self.journal_path, self.old_journal_path)
+        self._journal = open(self.journal_path, "a")
+        self._pending = 0
+
+        #copy the rows now (under the store's lock) so the snapshot never sees a half-made change
+        with self.students.lock:
+            rows = self.students.rows()
+            upto = self.local_changes.count
+            version = self.watcher.version
+        self._compactor = threading.Thread(target=self._write_snapshot, args=(rows, upto, version), daemon=True)
+        self._compactor.start()
+
+    def _write_snapshot(self, rows, upto, version):
+        if self._replace(rows, upto, version):
+            os.remove(self.old_journal_path)  #its changes are safely in the snapshot now
+        else:
+            #another program changed the marks file: leave it alone and keep the journal,
+            #which is folded into the next compaction once sync() has merged the file in
+            print(f"'{self.path}' was changed by another program, not overwriting it.", file=sys.stderr)
+
+    def close(self):
+        if self._journal is None:
+            return
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._pending or os.path.exists(self.old_journal_path):
+            self.save()  #also retries a compaction that was skipped because the file had changed
+        self._journal.close()
+        self._journal = None
+
+class SqliteStorage:
+    #Keeps the records in a SQLite database instead of the marks text file.
+    #One connection is opened and reused, the database runs in WAL mode so each
+    #change is a cheap append, and the same few SQL strings are used throughout so
+    #sqlite3 can keep them prepared in its statement cache. Ids and names are indexed,
+    #and so are the marks, so the figures and sort orders come straight from the indexes.
+
+    #SORT_KEYS name -> ORDER BY for that order, matching the in-memory views: ties stay in
+    #the order students were added (reversed too when descending, like DescendingView).
+    #Numeric ids sort as numbers like id_sort_key: all digits first, then by length without
+    #leading zeros, then as text (so ids too long for an INTEGER still sort right).
+    ID_ORDER = ("CASE WHEN id <> '' AND id NOT GLOB '*[^0-9]*' THEN 0 ELSE 1 END {0}, "
+                "CASE WHEN id <> '' AND id NOT GLOB '*[^0-9]*' THEN length(ltrim(id, '0')) ELSE 0 END {0}, "
+                "CASE WHEN id <> '' AND id NOT GLOB '*[^0-9]*' THEN ltrim(id, '0') ELSE id END {0}, pos {0}")
+    ORDER_BY = {
+        "name": "name_key {0}, pos {0}",
+        "id": ID_ORDER,
+        "overall": "overall {0}, pos {0}",
+        "exam": "exam {0}, pos {0}",
+        "grade": "{grade} {0}, pos {0}",
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self.students = None
+        #the connection is made here but may be used from the background saver thread
+        #(only ever one thread at a time), so sqlite3's same-thread check is turned off
+        import sqlite3
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS students (
+                    pos INTEGER PRIMARY KEY,   -- keeps the order students were added in
+                    id TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    name_key TEXT NOT NULL,    -- case-folded name for searching and sorting
+                    coursework INTEGER NOT NULL,
+                    exam INTEGER NOT NULL,
+                    overall INTEGER NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS students_name ON students (name_key)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS students_overall ON students (overall)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS students_exam ON students (exam)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS students_id_order ON students ("
+                              + self.ID_ORDER.format("") + ")")
+
+    def _rows(self, sql, args=()):
+        for sid, name, coursework, exam in self.conn.execute(sql, args):
+            yield Student(sid, name, coursework, exam)
+
+    def load(self, progress=None):
+        self.students = StudentStore(
+            self._rows("SELECT id, name, coursework, exam FROM students ORDER BY pos"))
+        print(f"Loaded '{self.path}' successfully.", file=sys.stderr)
+        return self.students
+
+    def _put(self, s):
+        self.conn.execute(
+            "INSERT INTO students (id, name, name_key, coursework, exam, overall) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET name = excluded.name, name_key = excluded.name_key, "
+            "coursework = excluded.coursework, exam = excluded.exam, overall = excluded.overall",
+            (s.id, s.name, s.name.casefold(), s.coursework, s.exam, s.overall))
+
+    def _delete(self, sid):
+        self.conn.execute("DELETE FROM students WHERE id = ?", (sid,))
+
+    def _rename(self, old_id, new_id):
+        self.conn.execute("UPDATE students SET id = ? WHERE id = ?", (new_id, old_id))
+
+    def save(self):
+        #replace everything with the loaded store in one transaction
+        with self.conn:
+            self.conn.execute("DELETE FROM students")
+            for s in self.students.rows():
+                self._put(Student(*s))
+
+    def check(self, field, value):
+        pass  #SQLite takes any id, name or mark the store accepts
+
+    def put(self, s):
+        with self.conn:
+            self._put(s)
+
+    def delete(self, sid):
+        with self.conn:
+            self._delete(sid)
+
+    def rename(self, old_id, new_id):
+        with self.conn:
+            self._rename(old_id, new_id)
+
+    def apply(self, changes):
+        #the whole batch goes in one transaction
+        with self.conn:
+            for name, args in changes:
+                if name == "put":
+                    self._put(*args)
+                elif name == "delete":
+                    self._delete(*args)
+                elif name == "rename":
+                    self._rename(*args)
+
+    #queries answered by SQLite
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    def average(self):
+        #average percentage, or None without students
+        total = self.conn.execute("SELECT AVG(overall) FROM students").fetchone()[0]
+        return None if total is None else (total / MAX_MARKS) * 100
+
+    def highest(self):
+        return next(self._rows("SELECT id, name, coursework, exam FROM students "
+                               "ORDER BY overall DESC, pos LIMIT 1"), None)
+
+    def lowest(self):
+        return next(self._rows("SELECT id, name, coursework, exam FROM students "
+                               "ORDER BY overall, pos LIMIT 1"), None)
+
+    def grade_counts(self):
+        grades = dict.fromkeys(GRADES, 0)
+        for overall, n in self.mark_counts().items():
+            grades[DEFAULT_POLICY.grade(overall)] += n
+        return grades
+
+    def mark_counts(self):
+        #overall mark -> number of students, straight off the overall index
+        return dict(self.conn.execute("SELECT overall, COUNT(*) FROM students GROUP BY overall"))
+
+    def percentiles(self, quantiles=(25, 50, 75)):
+        #read the two marks either side of each percentile straight off the overall index
+        count = self.count()
+        result = {}
+        for q in quantiles:
+            pos = (count - 1) * q / 100
+            rows = self.conn.execute(
+                "SELECT overall FROM students ORDER BY overall LIMIT 2 OFFSET ?", (int(pos),)
+            ).fetchall()
+            low = rows[0][0]
+            high = rows[-1][0]
+            result[q] = ((low + (high - low) * (pos - int(pos))) / MAX_MARKS) * 100
+        return result
+
+    @staticmethod
+    def grade_sql(policy=DEFAULT_POLICY):
+        #the policy's grade letter of overall as a CASE expression, using the lowest whole mark
+        #for each grade from its lookup table so SQL and GradingPolicy.grade always agree
+        cases = []
+        for i, grade in enumerate(policy.grades[:-1]):
+            lowest = next((mark for mark, g in enumerate(policy.table) if g <= i), policy.max_marks + 1)
+            cases.append(f"WHEN overall >= {lowest} THEN '{grade}'")
+        return f"CASE {' '.join(cases)} ELSE '{policy.grades[-1]}' END"
+
+    def ordered(self, key_name=None, reverse=False):
+        order_by = "pos"
+        if key_name is not None:
+            order_by = self.ORDER_BY[key_name].format("DESC" if reverse else "ASC", grade=self.grade_sql())
+        return self._rows("SELECT id, name, coursework, exam FROM students ORDER BY " + order_by)
+
+    def summary_lines(self):
+        if not self.count():
+            return ["No student records available."]
+        return format_summary(self.count(), self.average(), self.grade_counts(),
+                              self.percentiles(), self.highest(), self.lowest())
+
+    def sync(self):
+        return None  #only the marks text file is watched, SQLite handles other connections itself
+
+    def preview(self, count):
+        return StudentStore(self._rows("SELECT id, name, coursework, exam FROM students ORDER BY pos LIMIT ?",
+                                       (count,)))
+
+    def close(self):
+        self.conn.close()
+
+
+class BinaryMarksFile:
+    #Fixed-size binary records opened through mmap, so record N is read straight from
+    #its offset without parsing the rest of the file, and changing someone's marks only
+    #rewrites their 64 byte record. Layout (little endian):
+    #   header  (16 bytes): b"SMK1", version, name slot size, record count, padding
+    #   record  (64 bytes): id (12 bytes), name (40 bytes UTF-8), coursework, exam, deleted flag
+    #Deleted records are only flagged; saving through BinaryStorage squeezes them out.
+
+    MAGIC = b"SMK1"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHI4x")
+    RECORD = struct.Struct("<12s40sHHB7x")
+    ID_SIZE, NAME_SIZE = 12, 40
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.NAME_SIZE, 0))
+        self.path = path
+        self._file = open(path, "r+b")
+        self._map()
+        magic, version, name_size, self._count = self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or version != self.VERSION or name_size != self.NAME_SIZE:
+            self.close()
+            raise ValueError(f"'{path}' is not a binary marks file")
+        self._ids = None  #id -> record number, built the first time an id is looked up
+
+    def _map(self):
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def __len__(self):
+        #number of record slots, including deleted ones
+        return self._count
+
+    def _offset(self, n):
+        if not 0 <= n < self._count:
+            raise IndexError(n)
+        return self.HEADER.size + n * self.RECORD.size
+
+    @classmethod
+    def pack(cls, s):
+        #Raises ValueError if the id or name doesn't fit in its slot or a mark is out of range
+        sid, name = s.id.encode("utf-8"), s.name.encode("utf-8")
+        if len(sid) > cls.ID_SIZE or len(name) > cls.NAME_SIZE:
+            raise ValueError(f"id or name too long for the binary format: {s.id!r}, {s.name!r}")
+        try:
+            return cls.RECORD.pack(sid, name, s.coursework, s.exam, 0)
+        except struct.error:
+            raise ValueError(f"marks out of range for the binary format: {s.coursework}, {s.exam}")
+
+    def read(self, n):
+        #the Student in record n, or None if it was deleted
+        sid, name, coursework, exam, deleted = self.RECORD.unpack_from(self._mm, self._offset(n))
+        if deleted:
+            return None
+        return Student(sid.rstrip(b"\0").decode("utf-8"), name.rstrip(b"\0").decode("utf-8"),
+                       coursework, exam)
+
+    def __iter__(self):
+        #every student that hasn't been deleted, in record order
+        for n in range(self._count):
+            s = self.read(n)
+            if s is not None:
+                yield s
+
+    def page(self, start, count):
+        #record slots start .. start + count - 1, so RecordsTable can show the file directly
+        rows = (self.read(n) for n in range(start, min(start + count, self._count)))
+        return [s for s in rows if s is not None]
+
+    def index_of(self, sid):
+        #record number of a student id, or None (only the id slots are read to build the index)
+        if self._ids is None:
+            self._ids = {}
+            for n in range(self._count):
+                if not self._mm[self._offset(n) + self.RECORD.size - 8]:  #deleted flag
+                    self._ids[self.read_id(n)] = n
+        return self._ids.get(sid)
+
+    def read_id(self, n):
+        offset = self._offset(n)
+        return self._mm[offset:offset + self.ID_SIZE].rstrip(b"\0").decode("utf-8")
+
+    def read_name(self, n):
+        offset = self._offset(n) + self.ID_SIZE
+        return self._mm[offset:offset + self.NAME_SIZE].rstrip(b"\0").decode("utf-8")
+
+    def write(self, n, s):
+        #overwrite record n in place
+        record = self.pack(s)
+        old_id = self.read_id(n)
+        self._mm[self._offset(n):self._offset(n) + self.RECORD.size] = record
+        if self._ids is not None:
+            self._ids.pop(old_id, None)
+            self._ids[s.id] = n
+
+    def set_marks(self, n, coursework, exam):
+        #only the 4 bytes holding the marks are written
+        try:
+            struct.pack_into("<HH", self._mm, self._offset(n) + self.ID_SIZE + self.NAME_SIZE, coursework, exam)
+        except struct.error:
+            raise ValueError(f"marks out of range for the binary format: {coursework}, {exam}")
+
+    def mark_columns(self):
+        #(record numbers, overall marks) of every student that isn't deleted, read straight
+        #out of the mapped records: numpy arrays when numpy is imported, lists otherwise
+        start, end = self.HEADER.size, self.HEADER.size + self._count * self.RECORD.size
+        if np is not None:
+            records = np.frombuffer(self._mm[start:end], dtype=np.dtype(
+                [("id", "S12"), ("name", "S40"), ("coursework", "<u2"), ("exam", "<u2"), ("deleted", "u1"), ("pad", "V7")]))
+            live = np.flatnonzero(records["deleted"] == 0)
+            overall = records["coursework"][live].astype(np.int64) + records["exam"][live]
+            return live, overall
+        live, overall = [], []
+        for n, (sid, name, coursework, exam, deleted) in enumerate(self.RECORD.iter_unpack(self._mm[start:end])):
+            if not deleted:
+                live.append(n)
+                overall.append(coursework + exam)
+        return live, overall
+
+    def append(self, s):
+        record = self.pack(s)
+        self._mm.close()
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(record)
+        self._count += 1
+        self._file.seek(0)
+        self._file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.NAME_SIZE, self._count))
+        self._file.flush()
+        self._map()
+        if self._ids is not None:
+            self._ids[s.id] = self._count - 1
+        return self._count - 1
+
+    def delete(self, n):
+        self._mm[self._offset(n) + self.RECORD.size - 8] = 1
+        if self._ids is not None:
+            self._ids = None  #cheaper to rebuild on the next lookup than to search for the id
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def write_binary(path, students, errors=None):
+    #Write students to a new binary marks file (through a temp file + rename like the
+    #text snapshots). Students that don't fit the format go in errors. Returns the count written.
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(BinaryMarksFile.HEADER.pack(BinaryMarksFile.MAGIC, BinaryMarksFile.VERSION,
+                                            BinaryMarksFile.NAME_SIZE, 0))
+        for s in students:
+            try:
+                f.write(BinaryMarksFile.pack(s))
+                count += 1
+            except ValueError as e:
+                if errors is None:
+                    raise
+                errors.append((count + 1, str(e), s.name))
+        f.seek(0)
+        f.write(BinaryMarksFile.HEADER.pack(BinaryMarksFile.MAGIC, BinaryMarksFile.VERSION,
+                                            BinaryMarksFile.NAME_SIZE, count))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def text_to_binary(text_path, binary_path, errors):
+    #convert a marks text file to the binary format one line at a time
+    with open(text_path, "r") as f:
+        return write_binary(binary_path, (s for line_no, s in iter_student_rows(f, errors)), errors)
+
+
+def binary_to_text(binary_path, text_path):
+    #convert a binary marks file back to the text layout, returns the count written
+    marks = BinaryMarksFile(binary_path)
+    try:
+        rows = [(s.id, s.name, s.coursework, s.exam) for s in marks]
+    finally:
+        marks.close()
+    write_snapshot(text_path, rows)
+    return len(rows)
+
+
+class BinaryStorage(TextFileStorage):
+    #Storage for binary marks files: changes are written into the mmap'd records in
+    #place (a new student is appended, new marks only rewrite their 4 bytes), and save()
+    #rewrites the file without the deleted slots. Lookups and the cohort figures are
+    #answered straight from the records, so the command line never loads a StudentStore
+    #for them; the window still loads one, as everything it edits goes through the store.
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.marks = None
+
+    def _open(self):
+        if self.marks is None:
+            self.marks = BinaryMarksFile(self.path)
+        return self.marks
+
+    def sync(self):
+        return None  #only the marks text file is watched for changes by other programs
+
+    def check(self, field, value):
+        #the id and name slots have a fixed size and the marks are 16 bit
+        super().check(field, value)
+        if field in ("id", "name"):
+            size = BinaryMarksFile.ID_SIZE if field == "id" else BinaryMarksFile.NAME_SIZE
+            if len(value.encode("utf-8")) > size:
+                label = "ID" if field == "id" else field
+                raise ValueError(f"The student {label} can't be longer than {size} bytes in a binary marks file.")
+        elif field in ("coursework", "exam"):
+            try:
+                mark = int(value)
+            except ValueError:
+                return  #the store reports marks that aren't numbers
+            if not 0 <= mark <= 0xFFFF:
+                raise ValueError(f"The {field} mark must be from 0 to {0xFFFF} in a binary marks file.")
+
+    def preview(self, count):
+        return StudentStore(self._open().page(0, count))
+
+    def load(self, progress=None):
+        self.students = StudentStore(self._open())
+        print(f"Loaded '{self.path}' successfully.", file=sys.stderr)
+        return self.students
+
+    def save(self):
+        self.marks.close()
+        write_binary(self.path, (Student(*row) for row in self.students.rows()))
+        self.marks = BinaryMarksFile(self.path)
+
+    def apply(self, changes):
+        #each change only touches its own record, so they're just made one after another
+        for name, args in changes:
+            getattr(self, name)(*args)
+        self.marks.flush()
+
+    def put(self, s):
+        marks = self._open()
+        n = marks.index_of(s.id)
+        if n is None:
+            marks.append(s)
+        elif marks.read_name(n) == s.name:
+            marks.set_marks(n, s.coursework, s.exam)  #the usual edit, a mark changed
+        else:
+            marks.write(n, s)
+
+    def delete(self, sid):
+        n = self._open().index_of(sid)
+        if n is not None:
+            self.marks.delete(n)
+
+    def rename(self, old_id, new_id):
+        n = self._open().index_of(old_id)
+        if n is None:
+            return  #no record to rename, like delete()
+        s = self.marks.read(n)
+        s.id = new_id
+        self.marks.write(n, s)
+
+    #queries answered from the records
+    def get(self, sid):
+        n = self._open().index_of(sid)
+        return None if n is None else self.marks.read(n)
+
+    def count(self):
+        return len(self._open().mark_columns()[0])
+
+    def mark_counts(self):
+        overall = self._open().mark_columns()[1]
+        if np is not None:
+            marks, counts = np.unique(overall, return_counts=True)
+            return dict(zip((int(m) for m in marks), (int(n) for n in counts)))
+        counts = {}
+        for mark in overall:
+            counts[mark] = counts.get(mark, 0) + 1
+        return counts
+
+    def summary_lines(self):
+        #one pass over the marks columns, then only the highest and lowest records are read
+        live, overall = self._open().mark_columns()
+        if not len(live):
+            return ["No student records available."]
+        if np is not None:
+            best, worst = live[np.argmax(overall)], live[np.argmin(overall)]
+            average = float(overall.mean()) / MAX_MARKS * 100
+            percent = overall * (100 / MAX_MARKS)
+            percentiles = dict(zip((25, 50, 75), (float(q) for q in np.percentile(percent, (25, 50, 75)))))
+            grades = DEFAULT_POLICY.grade_counts(overall)
+        else:
+            best = live[max(range(len(live)), key=overall.__getitem__)]
+            worst = live[min(range(len(live)), key=overall.__getitem__)]
+            average = sum(overall) / len(overall) / MAX_MARKS * 100
+            percent = sorted(mark * 100 / MAX_MARKS for mark in overall)
+            percentiles = {q: percentile(percent, q) for q in (25, 50, 75)}
+            grades = DEFAULT_POLICY.grade_counts(overall)
+        return format_summary(len(live), average, grades, percentiles,
+                              self.marks.read(int(best)), self.marks.read(int(worst)))
+
+    def ordered(self, key_name=None, reverse=False):
+        if self.students is not None:
+            return super().ordered(key_name, reverse)
+        if key_name is None:
+            return iter(self._open())  #file order straight off the records, nothing is loaded
+        return sorted(self._open(), key=SORT_KEYS[key_name], reverse=reverse)
+
+    def close(self):
+        if self.marks is not None:
+            self.marks.flush()
+            self.marks.close()
+            self.marks = None
+
+
+def open_storage(path, read_only=False):
+    #pick the storage for a marks file: .db/.sqlite files use SQLite, .bin files the
+    #fixed-size binary records and anything else the journal. Commands that only read
+    #get the plain text storage instead, so they never create or compact a journal.
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".db", ".sqlite", ".sqlite3"):
+        return SqliteStorage(path)
+    if extension == ".bin":
+        return BinaryStorage(path)
+    if read_only:
+        return TextFileStorage(path)
+    return JournalStorage(path)
+
+
+def migrate_text_file(text_path, db_path):
+    #One-shot copy of a marks text file (count line + CSV rows) into a SQLite database.
+    #Returns the number of students copied.
+    storage = SqliteStorage(db_path)
+    try:
+        storage.students = load_data(text_path)
+        storage.save()
+        return len(storage.students)
+    finally:
+        storage.close()
+
+
+# Batch operations section (no GUI needed):
+
+def import_rows(students, f, errors):
+    #Add every student in an open marks/CSV file (id, name, coursework 1-3, exam) to the store.
+    #Bad lines and duplicate ids are recorded in errors. Returns how many were added.
+    added = 0
+    for line_no, s in iter_student_rows(f, errors):
+        try:
+            students.add(s)
+            added += 1
+        except ValueError as e:
+            errors.append((line_no, str(e), s.name))
+    return added
+
+
+class EditBatch:
+    #A batch of edits (name or id, field, new value) that is checked in full before
+    #anything changes, then applied in one go. If an edit still fails part way through,
+    #the ones already made are undone so the store is left exactly as it was.
+    #commit() returns the storage changes for the whole batch so they can be saved in one write.
+
+    def __init__(self, students):
+        self.students = students
+        self.edits = []     #(line number, key, field, value, line)
+        self._planned = []  #(Student, field, value) worked out by validate()
+
+    def __len__(self):
+        return len(self.edits)
+
+    def add(self, key, field, value, line_no=None, line=None):
+        self.edits.append((line_no, key.strip(), field.strip().lower(), value.strip(), line))
+
+    def read(self, f, errors):
+        #Add one edit per line of an open file: name or id, field, new value (e.g. "8327,exam,95").
+        #Lines that aren't edits at all are recorded in errors.
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split(",")
+            if len(parts) != 3:
+                errors.append((line_no, f"expected 3 fields, found {len(parts)}", line))
+                continue
+            self.add(*parts, line_no=line_no, line=line)
+
+    def validate(self):
+        #Check every edit against the store as it will be once the edits before it are made
+        #(so a student can be given a new id and then found by it further down).
+        #Returns (line number, message, line) for each edit that would fail.
+        errors = []
+        self._planned = []
+        ids = {}      #id -> Student after the earlier renames in the batch (None once it's freed)
+        renamed = {}  #Student -> their id after the earlier renames
+        for line_no, key, field, value, line in self.edits:
+            if key in ids:
+                s = ids[key]
+            else:
+                matches = self.students.find(key)
+                s = matches[0] if matches else None
+            if s is None:
+                errors.append((line_no, f"no student with name or ID '{key}'", line))
+            elif field not in StudentStore.FIELDS:
+                errors.append((line_no, "Invalid field selected.", line))
+            elif not value:
+                errors.append((line_no, "missing new value", line))
+            elif field in ("coursework", "exam") and not value.lstrip("-").isdigit():
+                errors.append((line_no, "Please enter a valid numeric value for coursework/exam.", line))
+            elif field == "id":
+                owner = ids[value] if value in ids else self.students.get(value)
+                if owner is not None and owner is not s:
+                    errors.append((line_no, f"Student ID '{value}' already exists.", line))
+                else:
+                    ids[renamed.get(s, s.id)] = None
+                    ids[value] = s
+                    renamed[s] = value
+                    self._planned.append((s, field, value))
+            else:
+                self._planned.append((s, field, value))
+        return errors
+
+    def commit(self):
+        #Apply the edits checked by validate(). Raises ValueError, with everything undone,
+        #if one of them fails anyway. Returns the (method name, args) changes for storage.apply().
+        undo = []  #(Student, field, value before)
+        with self.students.lock:
+            try:
+                for s, field, value in self._planned:
+                    old_value = getattr(s, field)
+                    self.students.update(s, field, value)
+                    undo.append((s, field, old_value))
+            except ValueError:
+                for s, field, old_value in reversed(undo):
+                    self.students.update(s, field, old_value)
+                raise
+
+            #renames in the order they were made (so swapping two ids works), then
+            #each changed student once with their final values, as copies the saver can keep
+            changes = []
+            for (s, field, old_value), (_, _, value) in zip(undo, self._planned):
+                if field == "id":
+                    changes.append(("rename", (old_value, value)))
+            for s in dict.fromkeys(s for s, field, old_value in undo):
+                changes.append(("put", (Student(s.id, s.name, s.coursework, s.exam),)))
+        return changes
+
+
+def apply_updates(students, f, errors):
+    #Apply one edit per line: name or id, field, new value (e.g. "8327,exam,95").
+    #All or nothing: if any line can't be applied it's recorded in errors and no edit is made.
+    #Returns how many were applied.
+    batch = EditBatch(students)
+    batch.read(f, errors)
+    errors.extend(batch.validate())
+    if errors:
+        return 0
+    batch.commit()
+    return len(batch)
+
+
+def export_report(records, f):
+    #write the records as CSV with the worked out overall, percentage and grade
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(["id", "name", "coursework", "exam", "overall", "percent", "grade"])
+    count = 0
+    for s in records:
+        writer.writerow([s.id, s.name, s.coursework, s.exam, s.overall, f"{s.percent:.2f}", s.grade])
+        count += 1
+    return count
+
+
+def parse_marks_file(path):
+    #Process pool worker: parse one marks file and send back compact columns (cheap to pickle).
+    #Repeated ids within the file are dropped here (the first wins, like load_data), so the
+    #parent only has to check ids against other files. Returns (path, columns, errors,
+    #seconds, worker pid) where columns is (line numbers, ids, names, coursework, exam):
+    #ids and names joined with newlines, numbers as arrays.
+    start = time.perf_counter()
+    errors = []
+    line_nos, coursework, exam = array("I"), array("i"), array("i")
+    ids, names = [], []
+    seen = set()
+    try:
+        with open(path, "r") as f:
+            for line_no, s in iter_student_rows(f, errors):
+                if s.id in seen:
+                    errors.append((line_no, f"Student ID '{s.id}' already exists.", s.name))
+                    continue
+                seen.add(s.id)
+                line_nos.append(line_no)
+                ids.append(s.id)
+                names.append(s.name)
+                coursework.append(s.coursework)
+                exam.append(s.exam)
+    except OSError as e:
+        errors.append((0, str(e), path))
+    columns = (line_nos, "\n".join(ids), "\n".join(names), coursework, exam)
+    return path, columns, errors, time.perf_counter() - start, os.getpid()
+
+
+def find_marks_files(patterns):
+    #directories give every .txt file inside them, anything else is treated as a glob
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.txt")
+        paths.extend(sorted(glob.glob(pattern)))
+    return list(dict.fromkeys(paths))  #drop repeats, keep order
+
+
+def ingest_files(students, paths, workers=None):
+    #Parse many marks files across a process pool and merge them into the store.
+    #Files are merged in the order given, so on a duplicate id the earlier file wins and the
+    #later row is reported. Returns {path: (rows added, errors)} and {worker pid: (rows, seconds)}.
+    #The new students are collected and added to the store in one add_many() at the end, so
+    #the running figures, sorted views and marks columns are built once, not row by row.
+    #The cycle collector is paused meanwhile: the merge makes hundreds of thousands of
+    #objects without any cycles, and python would otherwise keep rescanning all of them.
+    from concurrent.futures import ProcessPoolExecutor
+    results = {}
+    per_worker = {}
+    new = []
+    taken = set()  #ids added from earlier files
+    get = students.get
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, columns, errors, seconds, pid in pool.map(parse_marks_file, paths):
+                line_nos, ids, names, coursework, exam = columns
+                ids = ids.split("\n") if ids else []
+                names = names.split("\n") if names else []
+                before = len(new)
+                for line_no, sid, name, c, e in zip(line_nos, ids, names, coursework, exam):
+                    if sid in taken or get(sid) is not None:
+                        errors.append((line_no, f"Student ID '{sid}' already exists.", name))
+                    else:
+                        taken.add(sid)
+                        new.append(Student(sid, name, c, e))
+                results[path] = (len(new) - before, errors)
+                done, busy = per_worker.get(pid, (0, 0.0))
+                per_worker[pid] = (done + len(ids), busy + seconds)
+        students.add_many(new)
+    finally:
+        if collecting:
+            gc.enable()
+    return results, per_worker
+
+
+# Regrade section:
+
+def regrade(mark_counts, old_policy, new_policy):
+    #Compare two grading policies over a cohort given as {overall mark: number of students}.
+    #Each distinct mark is looked up once in both tables, so a cohort of millions costs no
+    #more than the few hundred marks it can have. Returns the grade counts under each
+    #policy and how many students move from one grade to another.
+    old_counts = dict.fromkeys(old_policy.grades, 0)
+    new_counts = dict.fromkeys(new_policy.grades, 0)
+    moves = {}
+    for overall, n in mark_counts.items():
+        old, new = old_policy.grade(overall), new_policy.grade(overall)
+        old_counts[old] += n
+        new_counts[new] += n
+        if old != new:
+            moves[old, new] = moves.get((old, new), 0) + n
+    return {
+        "count": sum(mark_counts.values()),
+        "old": old_counts,
+        "new": new_counts,
+        "changed": sum(moves.values()),
+        "moves": moves,
+    }
+
+
+def format_regrade(result, old_policy, new_policy):
+    lines = [
+        f"Old policy: {old_policy.describe()}",
+        f"New policy: {new_policy.describe()}",
+        "",
+        f"{'Grade':<6}{'Old':>10}{'New':>10}{'Change':>10}",
+    ]
+    for grade in dict.fromkeys(old_policy.grades + new_policy.grades):
+        old, new = result["old"].get(grade, 0), result["new"].get(grade, 0)
+        lines.append(f"{grade:<6}{old:>10,}{new:>10,}{new - old:>+10,}")
+    lines.append("")
+    lines.append(f"{result['changed']:,} of {result['count']:,} student(s) change grade.")
+    for (old, new), n in sorted(result["moves"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {old} -> {new}: {n:,}")
+    return lines
+
+
+# Streaming report section:
+
+class MarkHistogram:
+    #Number of students on each whole mark of one column. Marks are whole numbers in a
+    #small range (0-160 overall), so this stays a few hundred entries however big the
+    #cohort is, and the mean, variance and percentiles worked out from it are exact.
+
+    def __init__(self):
+        self.counts = {}  #mark -> number of students
+        self.count = 0
+
+    def add(self, mark):
+        self.counts[mark] = self.counts.get(mark, 0) + 1
+        self.count += 1
+
+    def mean(self):
+        return sum(mark * n for mark, n in self.counts.items()) / self.count
+
+    def variance(self):
+        #population variance
+        mean = self.mean()
+        return sum(n * (mark - mean) ** 2 for mark, n in self.counts.items()) / self.count
+
+    def percentiles(self, quantiles):
+        #same linear interpolation as percentile(), walking the marks in order instead of sorting every row
+        marks = sorted(self.counts)
+        result = {}
+        for q in quantiles:
+            pos = (self.count - 1) * q / 100
+            low = int(pos)
+            result[q] = self._value_at(marks, low)
+            if pos > low:
+                high = self._value_at(marks, low + 1)
+                result[q] += (high - result[q]) * (pos - low)
+        return result
+
+    def _value_at(self, marks, rank):
+        #the mark of the student at this position in sorted order
+        seen = 0
+        for mark in marks:
+            seen += self.counts[mark]
+            if rank < seen:
+                return mark
+        return marks[-1]
+
+    def summary(self, label, out_of):
+        return (f"{label}: mean {self.mean():.2f}/{out_of}, std dev {self.variance() ** 0.5:.2f}, "
+                f"min {min(self.counts)}, max {max(self.counts)}")
+
+
+def stream_report(students, quantiles=(10, 25, 50, 75, 90), policy=None):
+    #Work out the report figures from any iterable of Students in a single pass,
+    #holding only three histograms. Returns None if there were no students.
+    overall, coursework, exam = MarkHistogram(), MarkHistogram(), MarkHistogram()
+    for s in students:
+        overall.add(s.coursework + s.exam)
+        coursework.add(s.coursework)
+        exam.add(s.exam)
+    if not overall.count:
+        return None
+    policy = policy or DEFAULT_POLICY
+    grades = dict.fromkeys(policy.grades, 0)
+    for mark, n in overall.counts.items():
+        grades[policy.grade(mark)] += n
+    return {
+        "count": overall.count,
+        "overall": overall,
+        "coursework": coursework,
+        "exam": exam,
+        "grades": grades,
+        "percentiles": {q: (mark / policy.max_marks) * 100 for q, mark in overall.percentiles(quantiles).items()},
+    }
+
+
+def format_stream_report(report, bins=10):
+    #the figures as lines of text, with a bar chart of the overall marks in bins of 10
+    count, overall = report["count"], report["overall"]
+    lines = [
+        f"Total Students: {count}",
+        f"Average Percentage: {(overall.mean() / MAX_MARKS) * 100:.2f}%",
+        overall.summary("Overall", MAX_MARKS),
+        report["coursework"].summary("Coursework", 60),
+        report["exam"].summary("Exam", 100),
+        "Grades: " + "  ".join(f"{g}: {n} ({n / count:.1%})" for g, n in report["grades"].items()),
+        "Percentiles: " + "  ".join(f"P{q:g}: {v:.2f}%" for q, v in report["percentiles"].items()),
+        "",
+        "Overall marks:",
+    ]
+    binned = {}
+    for mark, n in overall.counts.items():
+        binned[mark // bins] = binned.get(mark // bins, 0) + n
+    widest = max(binned.values())
+    for b in range(min(binned), max(binned) + 1):
+        n = binned.get(b, 0)
+        lines.append(f"{b * bins:>4}-{b * bins + bins - 1:<4}{n:>10}  " + "#" * round(40 * n / widest))
+    return lines
+
+
+def stream_students(path, errors):
+    #Every student in a marks file, one at a time, without loading the file: text files
+    #are read line by line, .bin files record by record and SQLite a row at a time.
+    #Unlike loading, duplicate ids aren't checked (that would need every id in memory).
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".db", ".sqlite", ".sqlite3", ".bin"):
+        storage = open_storage(path)
+        try:
+            yield from storage.ordered()
+        finally:
+            storage.close()
+        return
+    with open(path, "r") as f:
+        for line_no, s in iter_student_rows(f, errors):
+            yield s
+
+
+# Benchmark section:
+
+FIRST_NAMES = ("Alan", "Gareth", "Jake", "Jo", "John", "Lee", "Les", "Matt", "Ron", "Sam",
+               "Amira", "Chen", "Dev", "Ewa", "Femi", "Hana", "Ines", "Kofi", "Lena", "Omar")
+LAST_NAMES = ("Shearer", "Southgate", "Hobbs", "Hyde", "Curry", "Scott", "Ferdinand", "Thompson",
+              "Herrema", "Sturtivant", "Okafor", "Nowak", "Silva", "Tanaka", "Patel", "Murphy")
+
+
+def generate_cohort(path, size, seed=0):
+    #write a synthetic marks file of size students (same layout as studentMarks.txt)
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write(f"{size}\n")
+        for i in range(size):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+            c1, c2, c3 = rng.randint(0, 20), rng.randint(0, 20), rng.randint(0, 20)
+            f.write(f"{100000 + i},{name},{c1},{c2},{c3},{rng.randint(0, 100)}\n")
+
+
+def parse_quantiles(text):
+    #"10,50,90" -> (10.0, 50.0, 90.0) for argparse
+    try:
+        quantiles = tuple(float(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected numbers separated by commas, not {text!r}")
+    if not all(0 <= q <= 100 for q in quantiles):
+        raise argparse.ArgumentTypeError("percentiles must be between 0 and 100")
+    return quantiles
+
+
+def parse_size(text):
+    #"1000", "10K" or "10M" -> number of students
+    text = text.strip().upper()
+    scale = {"K": 1000, "M": 1000000}.get(text[-1:], 1)
+    return int(text.rstrip("KM")) * scale
+
+
+def measure(operation, size, count, func, setup=None, repeat=5):
+    #Run func(*setup()) repeat times and keep the fastest time (setup isn't timed; it gives
+    #each run fresh arguments, e.g. a new store to delete from). tracemalloc slows everything
+    #down, so the peak Python memory comes from one more run of its own that isn't timed.
+    #count = operations done per run. Returns func's result from a timed run and the figures.
+    import tracemalloc
+    timings = []
+    for _ in range(max(repeat, 1)):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    args = setup() if setup is not None else ()
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings.sort()
+    seconds = timings[0]
+    return result, {
+        "operation": operation,
+        "size": size,
+        "seconds": round(seconds, 6),
+        "median_seconds": round(timings[len(timings) // 2], 6),
+        "runs": len(timings),
+        "peak_bytes": peak,
+        "ops_per_sec": round(count / seconds, 1) if seconds else None,
+    }
+
+
+def benchmark_size(size, workdir, queries=1000, seed=0, repeat=5):
+    #Time each Student Manager operation headlessly on a generated cohort of size students.
+    #view_all is measured without Tk as the work it does: one page of rows plus the summary.
+    path = os.path.join(workdir, f"bench_{size}.txt")
+    generate_cohort(path, size, seed)
+    rng = random.Random(seed)
+    results = []
+
+    students, r = measure("load_data", size, size, load_data, lambda: (path,), repeat)
+    results.append(r)
+    rows = students.rows()
+    _, r = measure("save_data", size, size, write_snapshot, lambda: (path + ".out", rows), repeat)
+    results.append(r)
+    #a new view each run (sorted_view() would hand back the one made by the first run)
+    _, r = measure("sort_records", size, size, SortedView, lambda: (students, "name"), repeat)
+    results.append(r)
+    _, r = measure("view_all", size, 1, lambda: (students.page(0, 12), summary_lines(students)), None, repeat)
+    results.append(r)
+
+    sample = rng.sample(students.page(0, size), min(queries, size))
+    names = [s.name.upper() for s in sample]
+    ids = [s.id for s in sample]
+    _, r = measure("lookup_name", size, len(names), lambda: [students.find(n) for n in names], None, repeat)
+    results.append(r)
+    _, r = measure("lookup_id", size, len(ids), lambda: [students.get(i) for i in ids], None, repeat)
+    results.append(r)
+    #every run deletes from a store of its own
+    _, r = measure("delete", size, len(ids), lambda store: [store.remove(store.get(i)) for i in ids],
+                   lambda: (StudentStore(Student(*row) for row in rows),), repeat)
+    results.append(r)
+
+    for leftover in (path, path + ".out"):
+        os.remove(leftover)
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    #results slower than the baseline by more than threshold (0.2 = 20%), as (result, baseline seconds)
+    before = {(r["operation"], r["size"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = before.get((r["operation"], r["size"]))
+        if old and r["seconds"] > old * (1 + threshold):
+            regressions.append((r, old))
+    return regressions
+
+
+def run_benchmarks(args):
+    import platform
+    import tempfile
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for size in sizes:
+            for r in benchmark_size(size, workdir, args.queries, repeat=args.repeat):
+                results.append(r)
+                print(f"{r['operation']:<13} {size:>10,} rows  {r['seconds']:>10.4f}s  "
+                      f"{r['peak_bytes'] / 1e6:>9.1f} MB peak  {r['ops_per_sec'] or 0:>14,.0f} ops/sec")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np is not None,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.threshold)
+        for r, old in regressions:
+            print(f"REGRESSION {r['operation']} at {r['size']:,} rows: "
+                  f"{r['seconds']:.4f}s vs {old:.4f}s baseline", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against '{args.baseline}'.")
+    return 0
+
+
+def summary_lines(students):
+    #the cohort figures as lines of text
+    if not students:
+        return ["No student records available."]
+    stats = students.stats
+    return format_summary(stats.count, stats.average(), stats.grades,
+                          students.columns.percentiles(), stats.highest(), stats.lowest())
+
+
+def format_summary(count, average, grades, percentiles, best, worst):
+    return [
+        f"Total Students: {count}",
+        f"Average Percentage: {average:.2f}%",
+        "Grades: " + "  ".join(f"{g}: {n}" for g, n in grades.items()),
+        "Percentiles: " + "  ".join(f"P{q}: {v:.2f}%" for q, v in percentiles.items()),
+        f"Highest Scorer: {best.name} ({best.id}) {best.percent:.2f}%",
+        f"Lowest Scorer: {worst.name} ({worst.id}) {worst.percent:.2f}%",
+    ]
+
+
+def report_errors(source, errors):
+    for line_no, message, line in errors:
+        print(f"{source} line {line_no}: {message} ({line!r})", file=sys.stderr)
+
+
+def run_command(args):
+    #Run one command line command against the marks file without creating any widgets
+    if args.command == "generate":
+        generate_cohort(args.output, parse_size(args.size), args.seed)
+        print(f"Wrote {parse_size(args.size):,} synthetic student(s) to '{args.output}'.")
+        return 0
+    if args.command == "bench":
+        return run_benchmarks(args)
+    if args.command == "migrate":
+        copied = migrate_text_file(args.file, args.database)
+        print(f"Copied {copied} student(s) from '{args.file}' to '{args.database}'.")
+        return 0
+    if args.command == "to-binary":
+        found = []
+        copied = text_to_binary(args.file, args.binary, found)
+        report_errors(args.file, found)
+        print(f"Copied {copied} student(s) from '{args.file}' to '{args.binary}'.")
+        return 1 if found else 0
+    if args.command == "from-binary":
+        copied = binary_to_text(args.binary, args.file)
+        print(f"Copied {copied} student(s) from '{args.binary}' to '{args.file}'.")
+        return 0
+
+    if args.command == "report" and args.stream:
+        found = []
+        start = time.perf_counter()
+        try:
+            report = stream_report(stream_students(args.file, found), args.quantiles)
+        except FileNotFoundError:
+            print(f"File not found: '{args.file}'", file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - start
+        report_errors(args.file, found)
+        if report is None:
+            print("No student records available.")
+        else:
+            print("\n".join(format_stream_report(report)))
+            print(f"Streamed {report['count']:,} student(s) in {elapsed:.2f}s.", file=sys.stderr)
+        return 1 if found else 0
+
+    if args.command == "regrade":
+        try:
+            old_policy = GradingPolicy.parse(args.old, args.old_max_marks)
+            new_policy = GradingPolicy.parse(args.boundaries, args.max_marks)
+        except ValueError as e:
+            print(f"Invalid grading policy: {e}", file=sys.stderr)
+            return 2
+
+    storage = open_storage(args.file, read_only=args.command in ("export", "report", "regrade"))
+    errors = 0
+    try:
+        if args.command == "import":
+            students = storage.load()
+            for path in args.csv:
+                with open(path, "r") as f:
+                    found = []
+                    added = import_rows(students, f, found)
+                report_errors(path, found)
+                errors += len(found)
+                print(f"Imported {added} student(s) from '{path}'.")
+            storage.save()  #one write for the whole import
+        elif args.command == "ingest":
+            students = storage.load()
+            paths = find_marks_files(args.paths)
+            start = time.perf_counter()
+            results, per_worker = ingest_files(students, paths, args.workers)
+            elapsed = time.perf_counter() - start
+            total = 0
+            for path, (added, found) in results.items():
+                report_errors(path, found)
+                errors += len(found)
+                total += added
+                print(f"{path}: {added} added, {len(found)} error(s)")
+            for pid, (rows, seconds) in sorted(per_worker.items()):
+                print(f"worker {pid}: {rows} rows in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)")
+            print(f"Ingested {total} student(s) from {len(paths)} file(s) in {elapsed:.2f}s.")
+            storage.save()
+        elif args.command == "update":
+            students = storage.load()
+            with open(args.edits, "r") as f:
+                found = []
+                applied = apply_updates(students, f, found)
+            report_errors(args.edits, found)
+            errors += len(found)
+            if found:
+                print(f"No edits applied from '{args.edits}', fix the line(s) above and try again.")
+            else:
+                print(f"Applied {applied} edit(s) from '{args.edits}'.")
+                storage.save()
+        elif args.command == "export":
+            records = storage.ordered(args.sort, args.desc)
+            if args.output == "-":
+                export_report(records, sys.stdout)
+            else:
+                with open(args.output, "w", newline="") as f:
+                    exported = export_report(records, f)
+                print(f"Exported {exported} student(s) to '{args.output}'.")
+        elif args.command == "report":
+            print("\n".join(storage.summary_lines()))
+        elif args.command == "regrade":
+            start = time.perf_counter()
+            marks = storage.mark_counts()
+            counted = time.perf_counter()
+            result = regrade(marks, old_policy, new_policy)
+            done = time.perf_counter()
+            print("\n".join(format_regrade(result, old_policy, new_policy)))
+            print(f"Counted {result['count']:,} student(s) in {counted - start:.3f}s, "
+                  f"regraded in {done - counted:.4f}s.", file=sys.stderr)
+    finally:
+        storage.close()
+    return 1 if errors else 0
+
+
+def main(argv=None, gui=None):
+    #gui(path, profile) opens the window when no command is given (None when there's no Tk)
+    parser = argparse.ArgumentParser(
+        description="Student Manager. Run without a command to open the window."
+    )
+    parser.add_argument("--file", default=FILE_PATH,
+                        help="marks file, a .db file for SQLite or a .bin binary record file "
+                             "(default: %(default)s)")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="open the window, print how long each start up step took, then close it")
+    commands = parser.add_subparsers(dest="command")
+    imp = commands.add_parser("import", help="add students from CSV files of id,name,c1,c2,c3,exam")
+    imp.add_argument("csv", nargs="+")
+    ing = commands.add_parser("ingest", help="merge many marks files (directories or globs) in parallel")
+    ing.add_argument("paths", nargs="+")
+    ing.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    upd = commands.add_parser("update", help="apply edits from a file of name-or-id,field,value lines "
+                                             "(all of them, or none if any line is wrong)")
+    upd.add_argument("edits")
+    exp = commands.add_parser("export", help="write every record with overall, percent and grade as CSV")
+    exp.add_argument("output", help="CSV file to write, or - for the screen")
+    exp.add_argument("--sort", choices=list(SORT_KEYS), help="order of the rows (default: file order)")
+    exp.add_argument("--desc", action="store_true", help="sort descending")
+    rep = commands.add_parser("report", help="print the cohort summary figures")
+    rep.add_argument("--stream", action="store_true",
+                     help="read the file once without loading it (for files bigger than memory) and add "
+                          "spread, per-component figures and a histogram; unsaved journal changes aren't included")
+    rep.add_argument("--quantiles", type=parse_quantiles, default=(10, 25, 50, 75, 90),
+                     help="percentiles for --stream, comma separated (default: 10,25,50,75,90)")
+    reg = commands.add_parser("regrade", help="show how the grades would change under new grade boundaries")
+    reg.add_argument("boundaries", help="lowest percentage for each grade but F, highest first, e.g. 75,65,55,45")
+    reg.add_argument("--max-marks", type=int, default=MAX_MARKS, help="total marks for the new policy (default: %(default)s)")
+    reg.add_argument("--old", default=",".join(f"{b:g}" for b in GRADE_BOUNDARIES),
+                     help="boundaries to compare against (default: %(default)s)")
+    reg.add_argument("--old-max-marks", type=int, default=MAX_MARKS,
+                     help="total marks for the old policy (default: %(default)s)")
+    mig = commands.add_parser("migrate", help="copy the marks text file into a new SQLite database")
+    mig.add_argument("database")
+    gen = commands.add_parser("generate", help="write a synthetic marks file for testing")
+    gen.add_argument("output")
+    gen.add_argument("--size", default="1K", help="number of students, e.g. 5000, 100K, 10M (default: %(default)s)")
+    gen.add_argument("--seed", type=int, default=0)
+    bench = commands.add_parser("bench", help="time load/save/sort/view/lookup/delete on synthetic cohorts")
+    bench.add_argument("--sizes", default="1K,10K,100K", help="comma separated cohort sizes (default: %(default)s)")
+    bench.add_argument("--queries", type=int, default=1000, help="lookups/deletes per size (default: %(default)s)")
+    bench.add_argument("--repeat", type=int, default=5,
+                       help="runs of each operation, the fastest is kept (default: %(default)s)")
+    bench.add_argument("--output", help="write the results to this JSON file")
+    bench.add_argument("--baseline", help="JSON results to compare against")
+    bench.add_argument("--threshold", type=float, default=0.2,
+                       help="slowdown that counts as a regression, 0.2 = 20%% (default: %(default)s)")
+    bench.add_argument("--workdir", help="where to write the generated files (default: system temp)")
+    to_bin = commands.add_parser("to-binary", help="convert the marks text file to a .bin fixed-size record file")
+    to_bin.add_argument("binary")
+    from_bin = commands.add_parser("from-binary", help="convert a .bin record file back into the marks text file")
+    from_bin.add_argument("binary")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        if gui is None:
+            parser.error("tkinter is not available, use one of the commands")
+        gui(args.file, args.startup_profile)  #numpy is imported after the window is up
+        return 0
+    import_numpy()
+    return run_command(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
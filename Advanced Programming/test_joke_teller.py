@@ -0,0 +1,129 @@
+#Tests for the joke service source in "02 - Alexa, Tell Me A Joke.py": jokes come from the
+#service while it answers, and from jokes.txt when it's slow or stopped.
+#Run with "python -m pytest" or "python -m unittest" from this folder.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "02 - Alexa, Tell Me A Joke.py")
+
+#jokes the stand-in service tells, so they can't be mistaken for ones from jokes.txt
+SERVICE_JOKES = [(f"Service setup {n}?", f"Service punchline {n}.") for n in range(20)]
+
+
+def load_joke_teller(folder):
+    #The script opens its window as soon as it's run, so only the part before the window is
+    #run here. That part reads "Advanced Programming/jokes.txt" from the current folder and
+    #saves its indexes next to it, so it's run from folder with a copy of jokes.txt.
+    with open(SCRIPT) as f:
+        source = f.read()
+    source = source[:source.index("#GUI settings")]
+    os.makedirs(os.path.join(folder, "Advanced Programming"))
+    shutil.copy(os.path.join(HERE, "jokes.txt"), os.path.join(folder, "Advanced Programming", "jokes.txt"))
+    namespace = {"__name__": "joke_teller", "__file__": SCRIPT}
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        with mock.patch.dict(os.environ, {"JOKE_SEED": "1"}):
+            os.environ.pop("JOKE_SERVICE", None)  #the local source, whatever the shell has set
+            exec(compile(source, SCRIPT, "exec"), namespace)
+    finally:
+        os.chdir(cwd)
+    return namespace
+
+
+def wait_for(condition, timeout=5.0):
+    #poll until condition() is true, the loop thread works in the background
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class HttpJokeSourceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.app = load_joke_teller(cls.folder)
+        cls.local_jokes = {cls.app["jokes"][n] for n in range(len(cls.app["jokes"]))}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app["search"].close()
+        cls.app["jokes"].close()
+        shutil.rmtree(cls.folder)
+
+    def setUp(self):
+        #give up on the service quickly so the tests don't wait the full two seconds
+        patcher = mock.patch.dict(self.app, {"TIMEOUT": 0.2, "RETRY_AFTER": 0.1})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_server(self, delay=0.0):
+        port, stop_server = self.app["start_stand_in_server"](SERVICE_JOKES, delay=delay)
+        stopped = []
+
+        def stop():
+            #the server's loop is closed once it stops, so only stop it once
+            if not stopped:
+                stopped.append(True)
+                stop_server()
+        self.addCleanup(stop)
+        return port, stop
+
+    def open_source(self, port):
+        source = self.app["HttpJokeSource"](f"http://127.0.0.1:{port}", self.app["LocalJokeSource"]())
+        self.addCleanup(source.close)  #runs before the server is stopped
+        return source
+
+    def test_jokes_come_from_the_service(self):
+        port, stop = self.start_server()
+        source = self.open_source(port)
+        self.assertTrue(wait_for(lambda: len(source.buffer) >= self.app["PREFETCH"]))
+        for _ in range(self.app["PREFETCH"]):
+            self.assertIn(source.next_joke(), SERVICE_JOKES)
+        self.assertEqual(source.fallbacks, 0)
+        self.assertTrue(source.online)
+
+    def test_a_slow_service_falls_back_to_jokes_txt(self):
+        port, stop = self.start_server(delay=1.0)
+        source = self.open_source(port)
+        started = time.perf_counter()
+        joke = source.next_joke()
+        self.assertLess(time.perf_counter() - started, 0.1)  #doesn't wait for the service
+        self.assertIn(joke, self.local_jokes)
+        self.assertTrue(wait_for(lambda: not source.online))
+        self.assertIn(source.next_joke(), self.local_jokes)
+        self.assertEqual(source.fallbacks, 2)
+
+    def test_a_stopped_service_falls_back_to_jokes_txt(self):
+        port, stop = self.start_server()
+        stop()
+        source = self.open_source(port)
+        self.assertTrue(wait_for(lambda: not source.online))
+        for _ in range(3):
+            self.assertIn(source.next_joke(), self.local_jokes)
+        self.assertEqual(source.fallbacks, 3)
+
+    def test_service_jokes_carry_on_after_it_stops(self):
+        #jokes already downloaded are told first, then jokes.txt takes over
+        port, stop = self.start_server()
+        source = self.open_source(port)
+        self.assertTrue(wait_for(lambda: len(source.buffer) >= self.app["PREFETCH"]))
+        stop()
+        told = [source.next_joke() for _ in range(self.app["PREFETCH"] + 3)]
+        self.assertTrue(all(joke in SERVICE_JOKES for joke in told[:self.app["PREFETCH"]]))
+        self.assertTrue(all(joke in self.local_jokes for joke in told[-3:]))
+        self.assertEqual(source.fallbacks, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+#Tests for student_manager.py: journal recovery, merging another program's changes,
+#all-or-nothing edit batches and the running statistics check.
+#Run with "python -m pytest" or "python -m unittest" from this folder.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import student_manager as sm
+from student_manager import Student, StudentStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+#(id, name, coursework, exam) rows every test starts from
+ROWS = [("1", "Ann Lee", 45, 80), ("2", "Bob Hyde", 30, 50), ("3", "Cy Scott", 12, 20)]
+
+
+class MarksFileTest(unittest.TestCase):
+    #a fresh marks file holding ROWS in a temporary folder
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.path = os.path.join(self.folder, "marks.txt")
+        sm.write_rows(self.path, ROWS)
+
+    def rows(self, students):
+        return [(s.id, s.name, s.coursework, s.exam) for s in students]
+
+    def rewrite_file(self, rows):
+        #another program writes the whole file again (a new file renamed over it, like an editor)
+        time.sleep(0.01)  #so the modification time moves on even on coarse clocks
+        sm.write_snapshot(self.path, rows)
+
+
+class JournalRecoveryTest(MarksFileTest):
+
+    def crash(self, storage):
+        #stop without compacting: the journal is left behind and the marks file is untouched
+        storage._journal.close()
+        storage._journal = None
+
+    def test_changes_are_replayed_after_a_crash(self):
+        storage = sm.JournalStorage(self.path)
+        students = storage.load()
+        ann = students.get("1")
+        students.update(ann, "exam", "99")
+        storage.put(ann)
+        dee = Student("4", "Dee Silva", 20, 60)
+        students.add(dee)
+        storage.put(dee)
+        students.remove(students.get("2"))
+        storage.delete("2")
+        students.update(students.get("3"), "id", "30")
+        storage.rename("3", "30")
+        self.crash(storage)
+        self.assertEqual(self.rows(sm.load_data(self.path)), ROWS)  #nothing reached the marks file
+
+        recovered = sm.JournalStorage(self.path)
+        expected = [("1", "Ann Lee", 45, 99), ("30", "Cy Scott", 12, 20), ("4", "Dee Silva", 20, 60)]
+        self.assertEqual(self.rows(recovered.load()), expected)
+        recovered.close()
+
+        #closing folded the journal into the marks file
+        self.assertEqual(self.rows(sm.load_data(self.path)), expected)
+        self.assertFalse(os.path.exists(recovered.old_journal_path))
+
+    def test_a_torn_last_line_is_skipped(self):
+        storage = sm.JournalStorage(self.path)
+        students = storage.load()
+        ann = students.get("1")
+        students.update(ann, "exam", "70")
+        storage.put(ann)
+        self.crash(storage)
+        with open(storage.journal_path, "a") as f:
+            f.write("P,5,Eve")  #the crash came part way through writing this line
+
+        recovered = sm.JournalStorage(self.path)
+        students = recovered.load()
+        self.assertEqual(students.get("1").exam, 70)
+        self.assertIsNone(students.get("5"))
+        recovered.close()
+
+    def test_replaying_twice_gives_the_same_records(self):
+        #a crash during compaction leaves .journal.old next to a new journal; both are replayed
+        storage = sm.JournalStorage(self.path)
+        students = storage.load()
+        bob = students.get("2")
+        students.update(bob, "coursework", "33")
+        storage.put(bob)
+        self.crash(storage)
+        shutil.copy(storage.journal_path, storage.old_journal_path)
+
+        recovered = sm.JournalStorage(self.path)
+        self.assertEqual(recovered.load().get("2").coursework, 33)
+        self.assertEqual(len(recovered.students), len(ROWS))
+        recovered.close()
+
+
+class SyncTest(MarksFileTest):
+
+    def setUp(self):
+        super().setUp()
+        self.storage = sm.JournalStorage(self.path)
+        self.students = self.storage.load()
+        self.addCleanup(self.storage.close)
+
+    def test_changes_made_only_in_the_file_are_merged(self):
+        self.rewrite_file([ROWS[0], ("2", "Bob Hyde", 30, 65), ROWS[2], ("4", "Dee Silva", 20, 60)])
+        report = self.storage.sync()
+        self.assertEqual((report["added"], report["updated"], report["conflicts"]), (1, 1, []))
+        self.assertEqual(self.students.get("2").exam, 65)
+        self.assertEqual(self.students.get("4").name, "Dee Silva")
+
+    def test_rows_appended_to_the_file_are_merged(self):
+        with open(self.path, "a") as f:
+            f.write("4,Dee Silva,10,5,5,60\n")
+        report = self.storage.sync()
+        self.assertFalse(report["rewritten"])
+        self.assertEqual(self.students.get("4").coursework, 20)
+
+    def test_a_conflict_keeps_our_change_and_saves_theirs(self):
+        ann = self.students.get("1")
+        self.students.update(ann, "exam", "90")
+        self.storage.put(ann)
+        self.rewrite_file([("1", "Ann Lee", 45, 60), ROWS[1], ROWS[2]])
+
+        report = self.storage.sync()
+        self.assertEqual(report["conflicts"], [("1", ("Ann Lee", 45, 90), ("Ann Lee", 45, 60))])
+        self.assertEqual(ann.exam, 90)
+        with open(self.storage.conflicts_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "time,id,name,coursework,exam,change")
+        self.assertTrue(lines[1].endswith(",1,Ann Lee,45,60,changed"), lines[1])
+
+        self.storage.save()
+        self.assertEqual(sm.load_data(self.path).get("1").exam, 90)
+
+    def test_a_student_deleted_there_and_changed_here_is_a_conflict(self):
+        bob = self.students.get("2")
+        self.students.update(bob, "exam", "55")
+        self.storage.put(bob)
+        self.rewrite_file([ROWS[0], ROWS[2]])
+
+        report = self.storage.sync()
+        self.assertEqual(report["conflicts"], [("2", ("Bob Hyde", 30, 55), None)])
+        self.assertIs(self.students.get("2"), bob)
+        with open(self.storage.conflicts_path) as f:
+            self.assertTrue(f.read().splitlines()[1].endswith(",2,,,,deleted"))
+
+    def test_an_unchanged_file_needs_no_merge(self):
+        self.assertIsNone(self.storage.sync())
+
+
+class EditBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.students = StudentStore(Student(*row) for row in ROWS)
+
+    def test_an_edit_failing_part_way_undoes_the_earlier_ones(self):
+        batch = sm.EditBatch(self.students)
+        batch.add("1", "exam", "99")
+        batch.add("Bob Hyde", "name", "Robert Hyde")
+        batch.add("3", "id", "7")
+        self.assertEqual(batch.validate(), [])
+        self.students.add(Student("7", "Gus Patel", 1, 1))  #takes the id after the check
+
+        with self.assertRaises(ValueError):
+            batch.commit()
+        self.assertEqual([(s.id, s.name, s.coursework, s.exam) for s in self.students][:3], ROWS)
+        self.assertEqual([s.id for s in self.students.find("Bob Hyde")], ["2"])
+        self.assertEqual(self.students.find("Robert Hyde"), [])
+        self.assertEqual(self.students.stats.highest().exam, 80)
+
+    def test_a_bad_line_stops_every_edit(self):
+        errors = []
+        applied = sm.apply_updates(self.students, ["1,exam,99\n", "nobody,exam,5\n"], errors)
+        self.assertEqual(applied, 0)
+        self.assertEqual([line_no for line_no, message, line in errors], [2])
+        self.assertEqual(self.students.get("1").exam, 80)
+
+    def test_commit_returns_renames_then_final_values(self):
+        batch = sm.EditBatch(self.students)
+        batch.add("1", "id", "10")
+        batch.add("10", "exam", "61")
+        self.assertEqual(batch.validate(), [])
+        changes = batch.commit()
+        self.assertEqual(changes[0], ("rename", ("1", "10")))
+        self.assertEqual([(name, args[0].id, args[0].exam) for name, args in changes[1:]], [("put", "10", 61)])
+
+
+class StatsCheckTest(unittest.TestCase):
+
+    def test_every_change_is_checked_against_a_recount(self):
+        with mock.patch.object(sm, "STATS_CHECK", True):
+            students = StudentStore()
+        self.assertTrue(students.stats.check)
+        students.add(Student("1", "Ann Lee", 45, 80))
+        students.add_many([Student("2", "Bob Hyde", 30, 50), Student("3", "Cy Scott", 12, 20)])
+        students.update(students.get("2"), "exam", "95")
+        students.remove(students.get("1"))
+        self.assertEqual(students.stats.highest().id, "2")
+        self.assertEqual(students.stats.lowest().id, "3")
+
+        students.stats.total_overall += 1  #a running figure goes wrong
+        with self.assertRaises(AssertionError):
+            students.add(Student("4", "Dee Silva", 20, 60))
+
+    def test_not_checked_unless_asked(self):
+        with mock.patch.object(sm, "STATS_CHECK", False):
+            students = StudentStore()
+        students.stats.total_overall += 1
+        students.add(Student("1", "Ann Lee", 45, 80))  #no recount, so nothing notices
+
+    def test_the_environment_variable_turns_it_on(self):
+        env = dict(os.environ, STUDENT_STATS_CHECK="1")
+        result = subprocess.run([sys.executable, "-c", "import student_manager; print(student_manager.STATS_CHECK)"],
+                                cwd=HERE, env=env, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "True")
+
+
+if __name__ == "__main__":
+    unittest.main()
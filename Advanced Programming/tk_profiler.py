@@ -0,0 +1,160 @@
+#Opt-in callback profiling for the Tkinter apps in this folder.
+#
+#Set TK_PROFILE=1 (or TK_PROFILE=some/file.json) before starting an app to record
+#how long every button command, key binding and root.after callback takes, plus how
+#late the event loop runs. The numbers are written as JSON when the app exits.
+#TK_PROFILE_OVERLAY=1 also opens a small window with the slowest callbacks so far.
+#When TK_PROFILE isn't set, install() returns straight away and nothing is wrapped.
+
+import atexit
+import json
+import os
+import time
+import tkinter as tk
+
+#upper edges of the latency histogram buckets, in milliseconds (the last bucket catches the rest)
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+#how often the event loop heartbeat runs, and how often the overlay refreshes
+HEARTBEAT_MS = 50
+OVERLAY_MS = 1000
+
+
+class LatencyStats:
+    #count, total, worst and a bucketed histogram of latencies for one callback
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        for i, edge in enumerate(BUCKETS_MS):
+            if ms <= edge:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self):
+        labels = [f"<={edge}ms" for edge in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class CallbackProfiler:
+    def __init__(self, root, app_name, output_path):
+        self.root = root
+        self.app_name = app_name
+        self.output_path = output_path
+        self.callbacks = {}  #callback name -> LatencyStats
+        self.lag = LatencyStats()  #how late the heartbeat ran, i.e. how long the loop was blocked
+        self.started = time.perf_counter()
+
+    def record(self, name, ms):
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks[name] = LatencyStats()
+        stats.add(ms)
+
+    def timed(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def slowest(self, n=8):
+        return sorted(self.callbacks.items(), key=lambda item: item[1].max_ms, reverse=True)[:n]
+
+    def report(self):
+        return {
+            "app": self.app_name,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "event_loop_lag": self.lag.as_dict(),
+            "callbacks": {name: stats.as_dict() for name, stats in sorted(self.callbacks.items())},
+        }
+
+    def dump(self):
+        with open(self.output_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Callback profile written to '{self.output_path}'.")
+
+
+def callback_name(func):
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", None) or repr(func)
+    return name.replace(".<locals>", "")
+
+
+def install(root, app_name):
+    #Start profiling the app's callbacks if TK_PROFILE is set. Returns the profiler or None.
+    setting = os.environ.get("TK_PROFILE", "")
+    if setting in ("", "0"):
+        return None
+    if setting == "1":
+        setting = app_name.lower().replace(" ", "_").replace(",", "") + "_profile.json"
+    profiler = CallbackProfiler(root, app_name, setting)
+
+    #root.after callbacks: wrapped before Tk sees them so they're reported under their own name
+    original_after = tk.Misc.after
+
+    def after(widget, ms, func=None, *args):
+        if func is None:
+            return original_after(widget, ms)
+        name = "after:" + callback_name(func)
+
+        def timed_after(*call_args):
+            return profiler.timed(name, func, *call_args)
+        return original_after(widget, ms, timed_after, *args)
+
+    #everything else Tk calls back into Python (button commands, bindings, scrollbars...)
+    original_call = tk.CallWrapper.__call__
+
+    def call(wrapper, *args):
+        func = wrapper.func
+        if callback_name(func).endswith("after.callit"):
+            return original_call(wrapper, *args)  #timed by the after() wrapper above
+        start = time.perf_counter()
+        try:
+            return original_call(wrapper, *args)
+        finally:
+            profiler.record(callback_name(func), (time.perf_counter() - start) * 1000)
+
+    tk.Misc.after = after
+    tk.CallWrapper.__call__ = call
+
+    #heartbeat: anything that blocks the loop makes the next beat late
+    def beat(expected):
+        now = time.perf_counter()
+        profiler.lag.add(max(0.0, (now - expected) * 1000))
+        original_after(root, HEARTBEAT_MS, beat, now + HEARTBEAT_MS / 1000)
+    original_after(root, HEARTBEAT_MS, beat, time.perf_counter() + HEARTBEAT_MS / 1000)
+
+    if os.environ.get("TK_PROFILE_OVERLAY") == "1":
+        show_overlay(profiler, original_after)
+    atexit.register(profiler.dump)
+    return profiler
+
+
+def show_overlay(profiler, original_after):
+    #small always-on-top window listing the slowest callbacks, refreshed every OVERLAY_MS
+    win = tk.Toplevel(profiler.root)
+    win.title("Callback Profile")
+    win.attributes("-topmost", True)
+    label = tk.Label(win, font=("Courier New", 10), justify="left", anchor="w")
+    label.pack(fill="both", expand=True, padx=8, pady=8)
+
+    def refresh():
+        lag = profiler.lag
+        lines = [f"loop lag  max {lag.max_ms:8.1f}ms  mean {lag.total_ms / max(lag.count, 1):6.1f}ms", ""]
+        for name, stats in profiler.slowest():
+            lines.append(f"{name[:32]:<32} n={stats.count:<6} max {stats.max_ms:8.1f}ms")
+        label.config(text="\n".join(lines))
+        original_after(win, OVERLAY_MS, refresh)
+    refresh()